@@ -2,10 +2,30 @@
 """
 Main entry point for IRIS Detection Service
 """
+import argparse
 import asyncio
+from functools import partial
 
 # Import from src package (no path manipulation needed)
-from src.controller import main
+from src.bluetooth.ble_handler import BLEHandler
+from src.config import DEVICE_NAME
+from src.controller import main, main_multiprocess
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="IRIS Detection Service")
+    parser.add_argument(
+        "--multiprocess", action="store_true",
+        help="run BLE ingest and analytics in separate processes joined by shared-memory rings"
+    )
+    parser.add_argument(
+        "--device", action="append", dest="devices", metavar="NAME_OR_ADDRESS",
+        help=f"BLE device name or address to read (default: {DEVICE_NAME}); repeat with --multiprocess for several"
+    )
+    args = parser.parse_args()
+    devices = tuple(dict.fromkeys(args.devices or [DEVICE_NAME]))
+    if args.multiprocess:
+        asyncio.run(main_multiprocess(devices=devices))
+    elif len(devices) > 1:
+        parser.error("several --device options need --multiprocess")
+    else:
+        asyncio.run(main(handler_factory=partial(BLEHandler, device_name=devices[0])))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Threshold calibration sweep.
+
+Evaluates every combination of blink threshold, nod threshold and window size over labelled
+recordings in one vectorized pass per recording (recordings spread across cores), and ranks
+settings by how well they separate alert from drowsy windows.
+
+Run from service/:
+    python -m scripts.calibrate --alert data/raw/alert_*.csv --drowsy data/raw/drowsy_*.csv \
+        --blink-thresholds 50:1000:25 --nod-thresholds 0.1:3:0.1 --window-sizes 300,600,1000 --output sweep.csv
+"""
+import argparse
+import logging
+import time
+import numpy as np
+from src.algorithm.ml_models import load_models
+from src.config import SAMPLE_RATE
+from src.feature_extraction.sweep import run_sweep
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def parse_grid(spec: str) -> np.ndarray:
+    """'start:stop:step' (stop inclusive) or a comma-separated list."""
+    if ":" in spec:
+        start, stop, step = (float(x) for x in spec.split(":"))
+        return np.arange(start, stop + step / 2, step)
+    return np.array([float(x) for x in spec.split(",")])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep blink/nod thresholds and window sizes over recordings")
+    parser.add_argument("--alert", nargs="*", default=[], help="recordings of an alert driver")
+    parser.add_argument("--drowsy", nargs="*", default=[], help="recordings of a drowsy driver")
+    parser.add_argument("--blink-thresholds", default="50:1000:50", type=parse_grid)
+    parser.add_argument("--nod-thresholds", default="0.1:2:0.1", type=parse_grid)
+    parser.add_argument("--window-sizes", default="1000", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--sample-rate", type=float, default=SAMPLE_RATE)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--no-model", action="store_true", help="skip HMM drowsy-rate columns")
+    parser.add_argument("--top", type=int, default=10, help="settings to print")
+    parser.add_argument("--output", help="write every setting to this CSV")
+    args = parser.parse_args(argv)
+    if not args.alert and not args.drowsy:
+        parser.error("give at least one --alert or --drowsy recording")
+
+    started = time.perf_counter()
+    results = run_sweep(
+        args.alert, args.drowsy, args.blink_thresholds, args.nod_thresholds, args.window_sizes,
+        args.sample_rate, models=None if args.no_model else load_models(), workers=args.workers
+    )
+    logger.info(f"Evaluated {len(results)} settings in {time.perf_counter() - started:.2f} s")
+
+    rank_by = "decision_gap" if "decision_gap" in results else "separability"
+    columns = ["window_size", "blink_threshold", "nod_threshold", "blink_separability", "nod_separability"]
+    columns += [c for c in ("drowsy_rate_alert", "drowsy_rate_drowsy", "decision_gap") if c in results]
+    print(results.sort_values(rank_by, ascending=False).head(args.top)[columns].to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+        logger.info(f"Full sweep written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Soak harness for the IRIS Detection Service.
+
+Drives the full single-process controller from a synthetic or recorded source at a
+configurable sample rate for a set duration, and tracks RSS, tracemalloc top allocators,
+event-loop lag, p50/p99 stage latencies and buffer/queue/client gauges over time.
+Exits non-zero if memory growth or tail latency exceed their budgets.
+
+Run from service/:
+    python -m scripts.soak --duration 3600 --rate 100
+    python -m scripts.soak --source data/raw/live_payloads.csv --duration 600 --report soak.json
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+import websockets
+from src.controller import main as controller_main
+from src.config import SENSOR_CHANNELS
+from src.monitoring import StageStats
+
+logger = logging.getLogger("soak")
+
+
+def rss_bytes() -> int:
+    """Current resident set size, or 0 when the platform gives no way to read it."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, not current
+    except ImportError:
+        return 0
+
+
+def slope_per_hour(series: Iterable[tuple], since: float) -> float:
+    """Least-squares slope of a (monotonic time, value) series after `since`, in units per hour."""
+    points = [(t, v) for t, v in series if t >= since]
+    if len(points) < 3:
+        return 0.0
+    t, v = np.array(points).T
+    return float(np.polyfit((t - t[0]) / 3600.0, v, 1)[0])
+
+
+# ------------------------
+# Sources (stand-ins for BLEHandler)
+# ------------------------
+class SyntheticSource:
+    """Pushes generated firmware-style payloads into data_callback at a fixed rate."""
+    def __init__(self, data_callback, gap_callback=None, rate: float = 100.0, stats: Optional[StageStats] = None):
+        self.data_callback = data_callback
+        self.gap_callback = gap_callback
+        self.rate = rate
+        self.stats = stats
+        self.client = SimpleNamespace(is_connected=False)
+        self._running = True
+        self.sent = 0
+
+    def payloads(self) -> Iterator[Dict]:
+        rng = np.random.default_rng(0)
+        for i in itertools.count():
+            t = i / self.rate
+            # Eyes open ~950 mV with a 300 ms blink every 4 s and a 2 s closure every minute
+            closed = (t % 4.0) < 0.3 or (t % 60.0) < 2.0
+            yield {
+                "ax": 0.98 + rng.normal(0, 0.01), "ay": 0.01 + rng.normal(0, 0.02), "az": 0.2 + rng.normal(0, 0.01),
+                "gx": rng.normal(0, 0.5), "gy": rng.normal(0, 0.5), "gz": rng.normal(0, 0.5),
+                "ir": int((100 if closed else 950) + rng.normal(0, 5)),
+            }
+
+    async def connect_and_subscribe(self):
+        self.client.is_connected = True
+        payloads = self.payloads()
+        start = time.monotonic()
+        while self._running:
+            # Cap each burst so a source that falls behind shows up as a rate shortfall
+            # instead of starving the event loop with an ever-growing catch-up batch
+            due = min(int((time.monotonic() - start) * self.rate) - self.sent, max(1, int(self.rate * 0.1)))
+            for _ in range(due):
+                started = time.perf_counter()
+                self.data_callback(next(payloads))
+                if self.stats is not None:
+                    self.stats.record("ingest", time.perf_counter() - started)
+                self.sent += 1
+            await asyncio.sleep(0.01)
+        self.client.is_connected = False
+
+    async def stop(self):
+        self._running = False
+
+
+class ReplaySource(SyntheticSource):
+    """Replays a recorded header-less CSV (firmware column order, as in live_payloads.csv) in a loop."""
+    def __init__(self, path: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        with open(path, newline="") as f:
+            self.rows = [
+                dict(zip(SENSOR_CHANNELS, map(float, row))) for row in csv.reader(f) if len(row) == len(SENSOR_CHANNELS)
+            ]
+        if not self.rows:
+            raise ValueError(f"No {len(SENSOR_CHANNELS)}-column rows in {path}")
+
+    def payloads(self) -> Iterator[Dict]:
+        return itertools.cycle(self.rows)
+
+
+# ------------------------
+# Monitors
+# ------------------------
+async def watch_loop_lag(stats: StageStats, interval: float = 0.1):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        stats.record("loop_lag", max(0.0, time.perf_counter() - started - interval))
+
+
+async def churn_clients(port: int, interval: float = 5.0):
+    """Connect and drop a dashboard client repeatedly so a leak in the clients set shows up."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with websockets.connect(f"ws://localhost:{port}") as ws:
+                await asyncio.wait_for(ws.recv(), timeout=2.0)
+        except Exception as e:
+            logger.debug(f"Client churn error: {e}")
+
+
+def check_budgets(report: Dict, stats: StageStats, args) -> List[str]:
+    """Budget gates over a finished run's report and gauges; returns one message per exceeded budget."""
+    failures = []
+    slopes = report["slopes_per_hour"]
+    if report["achieved_rate_hz"] < args.rate * args.min_rate_fraction:
+        failures.append(f"ingest kept up with {report['achieved_rate_hz']:.1f} of {args.rate} samples/s")
+    rss_slope_mb = slopes.get("rss_bytes", 0.0) / 1e6
+    if rss_slope_mb > args.max_rss_slope_mb:
+        failures.append(f"RSS grows {rss_slope_mb:.1f} MB/h (budget {args.max_rss_slope_mb} MB/h)")
+    for stage, pct in report["stages_ms"].items():
+        budget = args.max_loop_lag_ms if stage == "loop_lag" else args.max_p99_ms
+        if pct["p99"] > budget:
+            failures.append(f"{stage} p99 {pct['p99']:.1f} ms (budget {budget} ms)")
+    clients = stats.gauges.get("ws_clients")
+    if clients and clients.max > args.max_clients:
+        failures.append(f"ws_clients peaked at {clients.max:.0f} (budget {args.max_clients})")
+    if slopes.get("tasks", 0.0) > args.max_task_slope:
+        failures.append(f"asyncio tasks grow {slopes['tasks']:.1f}/h (budget {args.max_task_slope}/h)")
+    return failures
+
+
+async def soak(args) -> int:
+    stats = StageStats()
+    sources = []
+
+    def factory(**kw):
+        if args.source:
+            source = ReplaySource(args.source, rate=args.rate, stats=stats, **kw)
+        else:
+            source = SyntheticSource(rate=args.rate, stats=stats, **kw)
+        sources.append(source)
+        return source
+
+    tracemalloc.start(args.tracemalloc_frames)
+    controller = asyncio.create_task(
+        controller_main(handler_factory=factory, ws_port=args.ws_port, raw_csv_path=args.record, stats=stats,
+                        checkpoint_path=None)
+    )
+    helpers = [asyncio.create_task(watch_loop_lag(stats))]
+    if args.churn_clients:
+        helpers.append(asyncio.create_task(churn_clients(args.ws_port)))
+
+    start = time.monotonic()
+    warm_until = start + args.warmup
+    baseline_snapshot = None
+    while time.monotonic() - start < args.duration:
+        await asyncio.sleep(min(args.sample_interval, args.duration))
+        if controller.done():
+            controller.result()  # surface the controller's exception
+            logger.error("Controller exited early")
+            return 1
+        now = time.monotonic()
+        stats.gauge("rss_bytes", rss_bytes(), now)
+        stats.gauge("traced_bytes", tracemalloc.get_traced_memory()[0], now)
+        if baseline_snapshot is None and now >= warm_until:
+            baseline_snapshot = tracemalloc.take_snapshot()
+        summary = stats.summary()
+        logger.info(
+            f"[{now - start:7.0f}s] rss={stats.gauges['rss_bytes'].last / 1e6:.1f} MB "
+            + " ".join(f"{k}: p50={v['p50']:.2f} p99={v['p99']:.2f} ms" for k, v in summary.items())
+        )
+
+    final_snapshot = tracemalloc.take_snapshot()
+    for task in [controller, *helpers]:
+        task.cancel()
+    await asyncio.gather(controller, *helpers, return_exceptions=True)
+
+    # ------------------------
+    # Report and budget gates
+    # ------------------------
+    slopes = {name: slope_per_hour(series, warm_until) for name, series in stats.gauges.items()}
+    top = []
+    if baseline_snapshot is not None:
+        top = [str(d) for d in final_snapshot.compare_to(baseline_snapshot, "lineno")[:10]]
+    sent = sum(source.sent for source in sources)
+    report = {
+        "duration_s": args.duration,
+        "rate_hz": args.rate,
+        "achieved_rate_hz": sent / args.duration,
+        "stages_ms": stats.summary(),
+        "slopes_per_hour": slopes,
+        "top_allocators": top,
+    }
+    failures = check_budgets(report, stats, args)
+    report["failures"] = failures
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if failures:
+        logger.error("Soak FAILED: " + "; ".join(failures))
+        return 1
+    logger.info("Soak passed.")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Soak-test the IRIS Detection Service controller")
+    parser.add_argument("--duration", type=float, default=3600, help="run time in seconds")
+    parser.add_argument("--rate", type=float, default=100.0, help="samples per second pushed into the controller")
+    parser.add_argument("--source", help="recorded header-less CSV to replay instead of synthetic data")
+    parser.add_argument("--record", help="raw CSV path the controller records to (default: no recording)")
+    parser.add_argument("--report", help="write the JSON report to this path")
+    parser.add_argument("--ws-port", type=int, default=8766)
+    parser.add_argument("--churn-clients", action="store_true", help="repeatedly connect/disconnect a dashboard client")
+    parser.add_argument("--tracemalloc-frames", type=int, default=1, help="stack depth kept by tracemalloc")
+    parser.add_argument("--warmup", type=float, default=60, help="seconds excluded from slope fits")
+    parser.add_argument("--sample-interval", type=float, default=10, help="seconds between RSS samples")
+    parser.add_argument("--min-rate-fraction", type=float, default=0.95, help="budget: achieved / requested rate")
+    parser.add_argument("--max-rss-slope-mb", type=float, default=5.0, help="budget: RSS growth in MB per hour")
+    parser.add_argument("--max-p99-ms", type=float, default=250.0, help="budget: p99 of each pipeline stage")
+    parser.add_argument("--max-loop-lag-ms", type=float, default=100.0, help="budget: p99 event-loop lag")
+    parser.add_argument("--max-clients", type=int, default=4, help="budget: peak connected dashboard clients")
+    parser.add_argument("--max-task-slope", type=float, default=10.0, help="budget: growth in live asyncio tasks per hour")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sys.exit(asyncio.run(soak(parse_args())))
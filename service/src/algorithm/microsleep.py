@@ -0,0 +1,75 @@
+import logging
+import time
+from typing import Dict, Optional
+from ..config import (
+    SAMPLE_RATE, BLINK_THRESHOLD, EYE_CLOSURE_ALERT_MS, HEAD_DROP_GZ, HEAD_DROP_AY, EVENT_COOLDOWN_S
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MicrosleepDetector:
+    """
+    O(1)-per-sample event detector that runs in the ingest path, ahead of framing.
+
+    Raises an event as soon as a single sample completes a dangerous pattern instead of
+    waiting for a full frame to be featurized and scored:
+    - eye_closure: IR has stayed below `blink_threshold` for `closure_ms` (counted in samples)
+    - head_drop: |gz| above `gz_threshold`, or ay jumps `ay_threshold` g away from its running mean
+
+    Events are dicts with a "sample_time" (wall clock when the sample was ingested) so the
+    publisher can report sample-to-alert latency.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, blink_threshold=BLINK_THRESHOLD, closure_ms=EYE_CLOSURE_ALERT_MS,
+                 gz_threshold=HEAD_DROP_GZ, ay_threshold=HEAD_DROP_AY, cooldown_s=EVENT_COOLDOWN_S):
+        self.sample_rate = sample_rate
+        self.blink_threshold = blink_threshold
+        self.gz_threshold = gz_threshold
+        self.ay_threshold = ay_threshold
+        self.closure_samples = max(1, int(round(closure_ms / 1000 * sample_rate)))
+        self.cooldown_samples = int(round(cooldown_s * sample_rate))
+        self._ay_alpha = 2.0 / (sample_rate + 1)  # ~1 s exponential moving average
+        self.reset()
+
+    def reset(self):
+        """Forget all run state, e.g. after a gap in the stream."""
+        self._closed_run = 0
+        self._closure_fired = False
+        self._ay_mean: Optional[float] = None
+        self._head_cooldown = 0
+
+    def update(self, sample: Dict, sample_time: Optional[float] = None) -> Optional[Dict]:
+        """Feed one sample (dict with photodiode_value/ir, ay, gz). Returns an event dict or None."""
+        ir = sample.get("photodiode_value", sample.get("ir"))
+        event = None
+
+        # Sustained eye closure: fire once per closure, when the run reaches the limit
+        if ir is not None and ir < self.blink_threshold:
+            self._closed_run += 1
+            if self._closed_run >= self.closure_samples and not self._closure_fired:
+                self._closure_fired = True
+                event = {"event": "eye_closure", "duration_ms": self._closed_run / self.sample_rate * 1000}
+        else:
+            self._closed_run = 0
+            self._closure_fired = False
+
+        # Sharp head drop: gyro spike or ay jump relative to its running mean
+        gz = sample.get("gz")
+        ay = sample.get("ay")
+        if self._head_cooldown:
+            self._head_cooldown -= 1
+        elif event is None:
+            if gz is not None and abs(gz) > self.gz_threshold:
+                event = {"event": "head_drop", "gz": float(gz)}
+            elif ay is not None and self._ay_mean is not None and abs(ay - self._ay_mean) > self.ay_threshold:
+                event = {"event": "head_drop", "ay_delta": float(ay - self._ay_mean)}
+            if event is not None:
+                self._head_cooldown = self.cooldown_samples
+        if ay is not None and ay == ay:  # skip NaN so it cannot poison the mean
+            self._ay_mean = ay if self._ay_mean is None else self._ay_mean + self._ay_alpha * (ay - self._ay_mean)
+
+        if event is None:
+            return None
+        event.update({"type": "event", "sample_time": sample_time if sample_time is not None else time.time()})
+        logger.info(f"Fast-path event: {event}")
+        return event
@@ -50,16 +50,24 @@ def load_models():
     return alert_model, drowsy_model
 
 
-def predict_state(feature_vector, alert_model, drowsy_model):
+def score_margin(feature_vector, alert_model, drowsy_model):
     """
     Single-frame feature_vector = [avg_blink_duration_ms, nod_freq_hz, avg_accel_ay]
-    Returns 'Alert' or 'Drowsy'
+    Returns alert_score - drowsy_score: positive means 'Alert', and the size is the confidence.
     """
     X = np.array(feature_vector).reshape(1, 3)  # shape (1, 3)
     alert_score = alert_model.score(X)
     drowsy_score = drowsy_model.score(X)
     print(f"Alert Score: {alert_score:.2f}, Drowsy Score: {drowsy_score:.2f}")
-    return "Alert" if alert_score > drowsy_score else "Drowsy"
+    return alert_score - drowsy_score
+
+
+def predict_state(feature_vector, alert_model, drowsy_model):
+    """
+    Single-frame feature_vector = [avg_blink_duration_ms, nod_freq_hz, avg_accel_ay]
+    Returns 'Alert' or 'Drowsy'
+    """
+    return "Alert" if score_margin(feature_vector, alert_model, drowsy_model) > 0 else "Drowsy"
 
 
 if __name__ == '__main__':
@@ -0,0 +1,52 @@
+import logging
+from typing import Dict, Any
+import pandas as pd
+from .ml_models import score_margin
+from ..data_cleansing.signal_quality import check_frame
+
+logger = logging.getLogger(__name__)
+
+
+def analyze_frame(frame: pd.DataFrame, extractor, alert_model, drowsy_model) -> Dict[str, Any]:
+    """
+    Run feature extraction and HMM scoring on one frame and map the result to a driver status.
+
+    Shared by the single-process controller loop and the multi-process analytics workers
+    so both layouts make exactly the same decision for the same frame.
+    Returns {"status": ..., "prediction": ..., "margin": ..., "metrics": {...}, "quality": {...}, "faults": [...]},
+    where margin is the alert minus drowsy log-likelihood (see score_margin). A frame that fails
+    the signal-quality gate is not scored: status is "Sensor fault", faults names the failed
+    checks, and prediction and metrics are None.
+    """
+    quality, faults = check_frame(frame)
+    if faults:
+        return {
+            "status": "Sensor fault", "prediction": None, "margin": 0.0, "metrics": None,
+            "quality": quality, "faults": faults,
+        }
+
+    # Feature extraction
+    avg_accel = extractor.getAvgAccelScalar(frame)
+    blink_duration = extractor.getBlinkScalar(frame)
+    nod_freq = extractor.getNodFreqScalar(frame)
+
+    # HMM prediction: pass [blink_duration, nod_freq, avg_accel] (3-element vector)
+    margin = score_margin([blink_duration, nod_freq, avg_accel], alert_model, drowsy_model)
+    state_prediction = "Alert" if margin > 0 else "Drowsy"
+
+    # Determine driver state
+    if state_prediction == "Drowsy":
+        driver_status = "Danger"
+    elif blink_duration < 300 or avg_accel > 0.3:
+        driver_status = "Be careful"
+    else:
+        driver_status = "Looking good"
+
+    return {
+        "status": driver_status,
+        "prediction": state_prediction,
+        "margin": float(margin),
+        "metrics": {"avg_accel": float(avg_accel), "blink_duration": float(blink_duration), "nod_freq": float(nod_freq)},
+        "quality": quality,
+        "faults": [],
+    }
@@ -2,8 +2,10 @@ from bleak import BleakScanner, BleakClient
 import asyncio
 import logging
 import json
+import time
+from collections import deque
 from typing import Optional, Callable, Any
-from ..config import DEVICE_NAME, TX_CHAR_UUID, SERVICE_UUID
+from ..config import DEVICE_NAME, TX_CHAR_UUID, SERVICE_UUID, FAST_RECONNECT_TIMEOUT
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
@@ -12,7 +14,8 @@ class BLEHandler:
         self,
         data_callback: Callable[[Any], None],
         device_name: str = DEVICE_NAME,
-        tx_uuid: str = TX_CHAR_UUID
+        tx_uuid: str = TX_CHAR_UUID,
+        gap_callback: Optional[Callable[[float], None]] = None
     ):
         self.data_callback = data_callback
         self.device_name = device_name
@@ -21,54 +24,118 @@ class BLEHandler:
         self._running = True
         self._rx_buffer = ""
 
+        # Reconnect fast path and gap accounting
+        self.gap_callback = gap_callback  # called with the gap length (s) before data resumes
+        self._last_address: Optional[str] = None
+        self._disconnected_at: Optional[float] = None
+        self.reconnect_latencies = deque(maxlen=100)  # seconds from disconnect to resubscribed
+
+    async def _fast_reconnect(self) -> Optional[str]:
+        """
+        Connect directly to the last known address, skipping both scans.
+        Returns the address on success, None if there is no cached address or it failed.
+        """
+        if not self._last_address:
+            return None
+        addr = self._last_address
+        logging.info(f"Fast reconnect: connecting directly to last known address {addr}...")
+        client = BleakClient(addr, services=[SERVICE_UUID], timeout=FAST_RECONNECT_TIMEOUT)
+        try:
+            await client.connect()
+        except Exception as e:
+            logging.info(f"Fast reconnect to {addr} failed ({e}); falling back to scanning.")
+            try:
+                await client.disconnect()
+            except Exception:
+                pass
+            return None
+        self.client = client
+        return addr
+
+    def _mark_disconnected(self):
+        if self._disconnected_at is None and self._last_address is not None:
+            self._disconnected_at = time.monotonic()
+
+    def _mark_reconnected(self):
+        """Record reconnect latency and announce the data gap before notifications resume."""
+        # Any partial line from before the gap must not be glued to new data
+        self._rx_buffer = ""
+        if self._disconnected_at is None:
+            return
+        gap = time.monotonic() - self._disconnected_at
+        self._disconnected_at = None
+        self.reconnect_latencies.append(gap)
+        logging.info(f"Reconnected after {gap:.2f} s gap.")
+        if self.gap_callback:
+            try:
+                self.gap_callback(gap)
+            except Exception:
+                logging.exception("gap_callback failed.")
+
+    def _matches(self, device, adv=None) -> bool:
+        """True if a scanned peripheral is this handler's: device_name is its name or its address."""
+        wanted = self.device_name.lower()
+        candidates = (getattr(device, "name", None), getattr(adv, "local_name", None), getattr(device, "address", None))
+        return any(c and c.lower() == wanted for c in candidates)
+
+    async def _scan_and_connect(self, backoff: float) -> Optional[str]:
+        """Slow path: scan (service filter, then name) and connect. Returns the address or None."""
+        logging.info(f"Scanning for BLE device '{self.device_name}' (service filter: {SERVICE_UUID})...")
+        device = None
+
+        # Prefer service-UUID based discovery (more reliable)
+        try:
+            device = await BleakScanner.find_device_by_filter(
+                # Several handlers can scan at once (one per device), so match ours, not just the service
+                lambda d, ad: SERVICE_UUID.lower() in [u.lower() for u in (ad.service_uuids or [])] and self._matches(d, ad),
+                timeout=5.0
+            )
+        except OSError as ose:
+            # Handle Windows Bluetooth device not ready error
+            if "device is not ready" in str(ose).lower() or "-2147020577" in str(ose):
+                logging.warning(f"Windows Bluetooth device not ready: {ose}. Waiting before retry...")
+                await asyncio.sleep(3)
+                return None
+            logging.debug(f"Service-filtered scan not available or failed: {ose}")
+            device = None
+        except Exception as e:
+            logging.debug(f"Service-filtered scan not available or failed: {e}")
+            device = None
+
+        # Fallback to name-based discovery with retry on device not ready
+        if not device:
+            try:
+                devices = await BleakScanner.discover(timeout=5.0)
+                device = next((d for d in devices if self._matches(d)), None)
+            except OSError as ose:
+                if "device is not ready" in str(ose).lower() or "-2147020577" in str(ose):
+                    logging.warning(f"Windows Bluetooth device not ready during fallback scan: {ose}. Waiting before retry...")
+                    await asyncio.sleep(3)
+                    return None
+                raise
+
+        if not device:
+            logging.warning("Device not found. Retrying...")
+            await asyncio.sleep(backoff)
+            return None
+
+        addr = getattr(device, "address", str(device))
+        logging.info(f"Found device {getattr(device,'name', '')} @ {addr}. Connecting...")
+        self.client = BleakClient(addr)
+        await self.client.connect()
+        return addr
+
     async def connect_and_subscribe(self):
         """Connect to BLE device and subscribe to TX notifications."""
         backoff = 2  # seconds
         while self._running:
             try:
-                logging.info(f"Scanning for BLE device '{self.device_name}' (service filter: {SERVICE_UUID})...")
-                device = None
-
-                # Prefer service-UUID based discovery (more reliable)
-                try:
-                    device = await BleakScanner.find_device_by_filter(
-                        lambda d, ad: SERVICE_UUID.lower() in [u.lower() for u in (ad.service_uuids or [])],
-                        timeout=5.0
-                    )
-                except OSError as ose:
-                    # Handle Windows Bluetooth device not ready error
-                    if "device is not ready" in str(ose).lower() or "-2147020577" in str(ose):
-                        logging.warning(f"Windows Bluetooth device not ready: {ose}. Waiting before retry...")
-                        await asyncio.sleep(3)
+                addr = await self._fast_reconnect()
+                if addr is None:
+                    addr = await self._scan_and_connect(backoff)
+                    if addr is None:
+                        backoff = min(backoff * 2, 20)
                         continue
-                    logging.debug(f"Service-filtered scan not available or failed: {ose}")
-                    device = None
-                except Exception as e:
-                    logging.debug(f"Service-filtered scan not available or failed: {e}")
-                    device = None
-
-                # Fallback to name-based discovery with retry on device not ready
-                if not device:
-                    try:
-                        devices = await BleakScanner.discover(timeout=5.0)
-                        device = next((d for d in devices if d.name == self.device_name), None)
-                    except OSError as ose:
-                        if "device is not ready" in str(ose).lower() or "-2147020577" in str(ose):
-                            logging.warning(f"Windows Bluetooth device not ready during fallback scan: {ose}. Waiting before retry...")
-                            await asyncio.sleep(3)
-                            continue
-                        raise
-
-                if not device:
-                    logging.warning("Device not found. Retrying...")
-                    await asyncio.sleep(backoff)
-                    backoff = min(backoff * 2, 20)
-                    continue
-
-                addr = getattr(device, "address", str(device))
-                logging.info(f"Found device {getattr(device,'name', '')} @ {addr}. Connecting...")
-                self.client = BleakClient(addr)
-                await self.client.connect()
                 logging.info("Connected to peripheral.")
 
                 # Verify characteristic presence (Bleak API compatibility fix)
@@ -84,10 +151,14 @@ class BLEHandler:
                     logging.warning(f"TX characteristic {self.tx_uuid} not found on device; disconnecting.")
                     await self.client.disconnect()
                     self.client = None
+                    self._last_address = None
                     await asyncio.sleep(backoff)
                     backoff = min(backoff * 2, 20)
                     continue
 
+                self._last_address = addr
+                self._mark_reconnected()
+
                 # Subscribe to notifications
                 await self.client.start_notify(self.tx_uuid, self._handle_tx_data)
                 logging.info(f"Subscribed to notifications on {self.tx_uuid}")
@@ -98,6 +169,7 @@ class BLEHandler:
                 # Remain connected until stopped or disconnected
                 while self._running and getattr(self.client, "is_connected", False):
                     await asyncio.sleep(1)
+                self._mark_disconnected()
 
                 # Clean up if still connected
                 if self.client:
@@ -116,6 +188,7 @@ class BLEHandler:
                 break
             except Exception as e:
                 logging.exception(f"BLE handler error: {e}")
+                self._mark_disconnected()
                 # Ensure client is disconnected on unexpected error
                 try:
                     if self.client:
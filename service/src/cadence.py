@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Optional
+from .config import (
+    FRAME_SIZE, SAMPLE_RATE, CONFIDENT_MARGIN, CADENCE_STABLE_FRAMES, MAX_DECISION_LATENCY_S, MAX_BROADCAST_INTERVAL_S,
+    MARGIN_EWMA_ALPHA, MARGIN_DROP_FRACTION
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveCadence:
+    """
+    Scales scoring and broadcast rates with how clearly the driver is alert.
+
+    After `stable_frames` consecutive frames predicted "Alert" with a margin of at least
+    `confident_margin`, the scoring stride (score every Nth frame) and the broadcast
+    interval double, up to the bounds set by `max_latency_s` and `max_broadcast_s`.
+    A margin below `confident_margin` or `drop_fraction` below its recent EWMA (so a fall
+    from 80 to 30 counts even though 30 is still confident), a "Drowsy" prediction or a
+    fast-path event snaps both back to full rate at once and wakes the broadcaster. CPU time of scoring and broadcasting is
+    measured so `report()` can estimate the CPU saved against the fixed cadence.
+    """
+    def __init__(self, confident_margin: float = CONFIDENT_MARGIN, stable_frames: int = CADENCE_STABLE_FRAMES,
+                 max_latency_s: float = MAX_DECISION_LATENCY_S, max_broadcast_s: float = MAX_BROADCAST_INTERVAL_S,
+                 frame_period_s: float = FRAME_SIZE / SAMPLE_RATE, base_broadcast_s: float = 1.0,
+                 ewma_alpha: float = MARGIN_EWMA_ALPHA, drop_fraction: float = MARGIN_DROP_FRACTION):
+        self.confident_margin = confident_margin
+        self.stable_frames = stable_frames
+        self.ewma_alpha = ewma_alpha
+        self.drop_fraction = drop_fraction
+        self.max_stride = max(1, int(max_latency_s // frame_period_s))
+        self.base_broadcast_s = base_broadcast_s
+        self.max_broadcast_s = max(base_broadcast_s, max_broadcast_s)
+        self.stride = 1
+        self.broadcast_interval = base_broadcast_s
+        self.wake = asyncio.Event()
+        self._margins = deque(maxlen=stable_frames)
+        self._margin_ewma: Optional[float] = None  # recent confident margins; None after a tighten
+        self._frames_since_score = 0
+
+        # Accounting for the CPU report
+        self.frames_scored = 0
+        self.frames_skipped = 0
+        self.broadcasts_sent = 0
+        self._score_cpu = 0.0
+        self._broadcast_cpu = 0.0
+        self._started = time.monotonic()
+
+    def should_score(self) -> bool:
+        """Call once per frame; False means skip feature extraction and scoring for it."""
+        self._frames_since_score += 1
+        if self._frames_since_score >= self.stride:
+            self._frames_since_score = 0
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def observe(self, result: Dict, cpu_s: float = 0.0):
+        """Feed a scored frame (analyze_frame result) and the CPU time it took."""
+        self.frames_scored += 1
+        self._score_cpu += cpu_s
+        margin = result.get("margin", 0.0)
+        if result.get("prediction") != "Alert" or margin < self.confident_margin:
+            self._tighten(f"margin {margin:.1f}")
+            return
+        if self._margin_ewma is not None and margin < self._margin_ewma * (1 - self.drop_fraction):
+            self._tighten(f"margin {margin:.1f} dropped from ~{self._margin_ewma:.1f}")
+            return
+        self._margin_ewma = margin if self._margin_ewma is None else (
+            self.ewma_alpha * margin + (1 - self.ewma_alpha) * self._margin_ewma
+        )
+        self._margins.append(margin)
+        if len(self._margins) == self.stable_frames:
+            self._relax()
+
+    def on_event(self, event: Dict):
+        """A fast-path event always restores full rate."""
+        self._tighten(f"fast-path {event.get('event')}")
+
+    def record_broadcast(self, cpu_s: float):
+        self.broadcasts_sent += 1
+        self._broadcast_cpu += cpu_s
+
+    def _relax(self):
+        stride = min(self.stride * 2, self.max_stride)
+        interval = min(self.broadcast_interval * 2, self.max_broadcast_s)
+        if (stride, interval) != (self.stride, self.broadcast_interval):
+            self.stride, self.broadcast_interval = stride, interval
+            logger.info(f"Cadence relaxed: scoring every {stride} frame(s), broadcast every {interval:.1f} s")
+        self._margins.clear()
+
+    def _tighten(self, reason: str):
+        self._margins.clear()
+        self._margin_ewma = None
+        self._frames_since_score = 0
+        if (self.stride, self.broadcast_interval) != (1, self.base_broadcast_s):
+            self.stride, self.broadcast_interval = 1, self.base_broadcast_s
+            logger.info(f"Cadence back to full rate ({reason})")
+        self.wake.set()
+
+    async def wait_broadcast(self):
+        """Sleep until the next broadcast is due, or until the cadence is tightened."""
+        self.wake.clear()
+        try:
+            await asyncio.wait_for(self.wake.wait(), timeout=self.broadcast_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    def report(self) -> Dict[str, float]:
+        """CPU used and estimated CPU saved versus scoring every frame and broadcasting every base interval."""
+        per_score = self._score_cpu / self.frames_scored if self.frames_scored else 0.0
+        per_broadcast = self._broadcast_cpu / self.broadcasts_sent if self.broadcasts_sent else 0.0
+        fixed_broadcasts = (time.monotonic() - self._started) / self.base_broadcast_s
+        saved = self.frames_skipped * per_score + max(0.0, fixed_broadcasts - self.broadcasts_sent) * per_broadcast
+        used = self._score_cpu + self._broadcast_cpu
+        return {
+            "frames_scored": self.frames_scored,
+            "frames_skipped": self.frames_skipped,
+            "broadcasts_sent": self.broadcasts_sent,
+            "cpu_used_s": round(used, 4),
+            "cpu_saved_s": round(saved, 4),
+            "saved_fraction": round(saved / (used + saved), 3) if used + saved else 0.0,
+        }
@@ -0,0 +1,78 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+import numpy as np
+from .config import CHECKPOINT_MAX_AGE_S
+
+logger = logging.getLogger(__name__)
+
+_ARRAY_KEY = "__ndarray__"  # JSON placeholder for an array stored beside the metadata
+
+
+class CheckpointManager:
+    """
+    Atomic snapshot file for warm restarts.
+
+    The caller builds the snapshot on the event loop (components expose cheap `snapshot()` /
+    `restore()` methods) and hands it to `write()`, which is safe to run in an executor:
+    the file goes to a temp file that is renamed over the target, so a crash mid-write
+    never leaves a torn checkpoint. `load()` ignores snapshots older than `max_age_s`,
+    because stitching a frame across a longer outage would mix unrelated data.
+
+    Snapshots are plain data: arrays are stored in an .npz archive and everything else as
+    JSON inside it, loaded with `allow_pickle=False`, so a tampered checkpoint can at worst
+    restore wrong values, never run code.
+    """
+    def __init__(self, path: str, max_age_s: float = CHECKPOINT_MAX_AGE_S):
+        self.path = Path(path)
+        self.max_age_s = max_age_s
+        self.age: Optional[float] = None  # s between the last loaded snapshot and its load
+
+    def write(self, snapshot: Dict[str, Any]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        arrays: Dict[str, np.ndarray] = {}
+
+        def stash(value):
+            if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+                key = f"a{len(arrays)}"
+                arrays[key] = value
+                return {_ARRAY_KEY: key}
+            if isinstance(value, np.generic):
+                return value.item()
+            raise TypeError(f"Cannot checkpoint {type(value).__name__}")
+
+        meta = json.dumps({"saved_at": time.time(), "components": snapshot}, default=stash)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, meta=np.array(meta), **arrays)
+            os.replace(tmp, self.path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Return the saved components if the checkpoint exists and is recent enough, else None."""
+        if not self.path.exists():
+            return None
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                arrays = {key: data[key] for key in data.files if key != "meta"}
+                payload = json.loads(
+                    str(data["meta"]),
+                    object_hook=lambda obj: arrays[obj[_ARRAY_KEY]] if _ARRAY_KEY in obj else obj,
+                )
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+        age = time.time() - payload.get("saved_at", 0)
+        if age > self.max_age_s:
+            logger.info(f"Checkpoint {self.path} is {age:.0f} s old (limit {self.max_age_s} s); starting cold")
+            return None
+        logger.info(f"Restoring checkpoint {self.path} saved {age:.1f} s ago")
+        self.age = age
+        return payload["components"]
@@ -15,3 +15,63 @@ SAMPLE_RATE = 10   # Hz, ACTUAL sampling rate from device (ESP32 delay=100ms →
 BLINK_THRESHOLD = 250  # mV (was 1000, now corrected for your sensor range)
 
 NOD_THRESHOLD = 0.5    # g, threshold to detect nodding frequency
+
+# -----------Multi-process Transport ----------- #
+
+# Column order of a decoded sample, matching the firmware JSON/CSV layout
+# (transmitter_doc.ino: ax, ay, az, gx, gy, gz, ir)
+SENSOR_CHANNELS = ("ax", "ay", "az", "gx", "gy", "gz", "ir")
+
+# Storage dtype per channel, used from ingest to scoring: IR is a 12-bit ADC reading
+# (0-4095 fits int16), IMU readings carry 2-3 decimals (float32 is ample)
+CHANNEL_DTYPES = {"ax": "float32", "ay": "float32", "az": "float32",
+                  "gx": "float32", "gy": "float32", "gz": "float32", "ir": "int16"}
+IR_MISSING = 32767  # int16 stand-in for a missing IR sample (no NaN); above any blink threshold, so never a closed eye
+
+RING_CAPACITY_FRAMES = 4  # Shared-memory ring size per device, in frames (4 x 1000 rows = 400 s at 10 Hz)
+ANALYTICS_WORKERS = 1     # Number of analytics processes in --multiprocess mode (at most one per device is used)
+
+# -----------Dashboard State History ----------- #
+
+# (resolution s, retention s) per tier; resolution 0 keeps every recorded state
+HISTORY_TIERS = ((0, 10 * 60), (1, 60 * 60), (60, 24 * 60 * 60))
+HISTORY_MAX_RATE_HZ = 10             # Upper bound on recorded states per second; sizes the raw tier
+HISTORY_PATH = None                  # e.g. "./data/interim/state_history.npz" to persist across restarts
+HISTORY_PERSIST_INTERVAL_S = 60      # How often the history is written when HISTORY_PATH is set
+
+# -----------Fast-Path Event Detection ----------- #
+
+EYE_CLOSURE_ALERT_MS = 1000  # ms, IR below BLINK_THRESHOLD for this long raises an immediate alert
+HEAD_DROP_GZ = 60.0          # °/s, |gz| spike treated as a sharp head drop
+HEAD_DROP_AY = 0.5           # g, ay deviation from its ~1 s running mean treated as a head drop
+EVENT_COOLDOWN_S = 2.0       # s, minimum spacing between head-drop events
+
+# -----------BLE Reconnect ----------- #
+
+FAST_RECONNECT_TIMEOUT = 3.0  # s, direct connect to the last known address before falling back to scanning
+GAP_MIN_FRAME_ROWS = FRAME_SIZE // 10  # A partial frame closed by a stream gap is scored if at least this long, else dropped
+
+# -----------Warm Restart ----------- #
+
+CHECKPOINT_PATH = "./data/interim/checkpoint.npz"  # None disables checkpointing
+CHECKPOINT_INTERVAL_S = 5    # s between snapshots of the frame buffer and decision state
+CHECKPOINT_MAX_AGE_S = 30    # s, older snapshots are ignored on startup
+
+# -----------Adaptive Processing Cadence ----------- #
+
+ADAPTIVE_CADENCE = True          # Back off scoring/broadcasts while the driver is confidently alert
+CONFIDENT_MARGIN = 10.0          # Alert-minus-drowsy HMM log-likelihood counted as confidently alert
+CADENCE_STABLE_FRAMES = 3        # Consecutive confident frames required before backing off further
+MARGIN_EWMA_ALPHA = 0.3          # Weight of the newest margin in the recent-margin EWMA
+MARGIN_DROP_FRACTION = 0.5       # Full rate again when a margin falls this far below its recent EWMA
+MAX_DECISION_LATENCY_S = 300     # s, upper bound on time between scored frames when backed off
+MAX_BROADCAST_INTERVAL_S = 5.0   # s, slowest dashboard broadcast cadence (fixed cadence is 1 s)
+
+# -----------Signal Quality Gate ----------- #
+
+IR_SATURATION = 4095            # 12-bit ADC full scale; IR at this value is clipped, not a reading
+SQ_MAX_SATURATION = 0.2         # Max fraction of saturated IR samples per window
+SQ_MAX_FLATLINE = 0.5           # Max fraction of unchanged consecutive samples (IR, or all IMU axes at once)
+SQ_MAX_DROPOUT = 0.2            # Max fraction of samples missing ir/ay/gz
+SQ_ACCEL_RANGE_G = (0.5, 2.0)   # g, plausible |accel| for a worn headset (gravity plus head motion)
+SQ_MAX_IMU_OUTLIERS = 0.2       # Max fraction of samples with |accel| outside SQ_ACCEL_RANGE_G
@@ -1,14 +1,26 @@
 import asyncio
+import multiprocessing as mp
+import queue as queue_module
 import time
 import logging
 from pathlib import Path
+from typing import Any, Callable, Optional
 from .data_cleansing.data_processor import DataProcessor
 from .bluetooth.ble_handler import BLEHandler
 from .feature_extraction.feature_vector import FeatureExtractor
 from .algorithm.baseline import load_baseline, define_and_save_drowsiness_baseline
-from .algorithm.ml_models import load_models, predict_state
-from .config import SAMPLE_RATE, BLINK_THRESHOLD, NOD_THRESHOLD
+from .algorithm.ml_models import load_models
+from .algorithm.pipeline import analyze_frame
+from .algorithm.microsleep import MicrosleepDetector
+from .config import SAMPLE_RATE, BLINK_THRESHOLD, NOD_THRESHOLD, DEVICE_NAME, FRAME_SIZE, RING_CAPACITY_FRAMES, ANALYTICS_WORKERS
+from .config import HISTORY_PATH, HISTORY_PERSIST_INTERVAL_S, CHECKPOINT_PATH, CHECKPOINT_INTERVAL_S
+from .config import ADAPTIVE_CADENCE
+from .ipc import SharedRingBuffer, run_ingest, run_analytics
 from .network.ws_server import WebSocketServer
+from .network.history import StateHistory
+from .monitoring import StageStats
+from .checkpoint import CheckpointManager
+from .cadence import AdaptiveCadence
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,14 +31,108 @@ PREPROCESSED_DIR = Path("./data/preprocessed")
 RAW_DIR.mkdir(parents=True, exist_ok=True)
 PREPROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
-async def main():
+async def persist_history(history: StateHistory):
+    """Periodically write the state history; the file write runs off the event loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(HISTORY_PERSIST_INTERVAL_S)
+        try:
+            await loop.run_in_executor(None, history.write, history.snapshot())
+        except Exception as e:
+            logger.warning(f"Failed to persist state history: {e}")
+
+async def persist_checkpoint(checkpoint: CheckpointManager, take_snapshot: Callable[[], dict]):
+    """Periodically snapshot pipeline state on the loop and write it from an executor."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(CHECKPOINT_INTERVAL_S)
+        try:
+            await loop.run_in_executor(None, checkpoint.write, take_snapshot())
+        except Exception as e:
+            logger.warning(f"Failed to write checkpoint: {e}")
+
+def new_device_state() -> dict:
+    """Dashboard state of one device before its first result."""
+    return {
+        "connected": False,
+        "status": "Unknown",
+        "metrics": {"avg_accel": 0.0, "blink_duration": 0.0, "nod_freq": 0.0},
+        "sensor_faults": [],
+        "last_event": None
+    }
+
+def update_device_state(state: dict, result: dict) -> dict:
+    """Fold a multiprocess result or fast-path event into its device's entry of `state["devices"]`."""
+    device_state = state["devices"].setdefault(result["device"], new_device_state())
+    if result.get("type") == "event":
+        device_state["last_event"] = result
+    else:
+        device_state.update({
+            "status": result["status"],
+            "metrics": result["metrics"] or device_state["metrics"],
+            "sensor_faults": result["faults"]
+        })
+    return device_state
+
+def mirror_device(state: dict, device: str):
+    """Copy a device's status, metrics, faults and last event to the top level of `state`."""
+    state.update({key: value for key, value in state["devices"][device].items() if key != "connected"})
+
+def device_path(path: str, device: str) -> str:
+    """Per-device variant of a data file path, e.g. state_history_<device>.npz."""
+    path = Path(path)
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in device)
+    return str(path.with_name(f"{path.stem}_{safe}{path.suffix}"))
+
+def restore_checkpoint(checkpoint: Optional[CheckpointManager], state: dict, processor: Optional[DataProcessor] = None) -> float:
+    """Warm-start from a recent checkpoint. Returns the session start time to continue from."""
+    restored = checkpoint.load() if checkpoint else None
+    if not restored:
+        return time.time()
+    # Only keys this layout knows, so a checkpoint from the other controller cannot leak stale fields
+    state.update({key: value for key, value in restored["state"].items() if key in state})
+    state["connected"] = False  # the old connection is gone until the handler reconnects
+    if processor is not None and restored.get("processor"):
+        # The partial frame carries on across the restart (load() only accepts snapshots
+        # younger than CHECKPOINT_MAX_AGE_S); the gap is recorded in the frame
+        processor.restore(restored["processor"])
+        processor.bridge_gap(checkpoint.age)
+    return time.time() - state.get("duration", 0.0)
+
+async def publish_event(ws_server: WebSocketServer, event: dict):
+    """Push a fast-path event to dashboards right away and log its sample-to-alert latency."""
+    latency_ms = (time.time() - event["sample_time"]) * 1000
+    try:
+        await ws_server.broadcast({**event, "latency_ms": round(latency_ms, 1)})
+    except Exception as e:
+        logger.debug(f"Event broadcast error: {e}")
+    logger.info(f"Alert '{event['event']}' published {latency_ms:.1f} ms after its sample")
+
+async def main(
+    handler_factory: Optional[Callable[..., Any]] = None,
+    ws_port: int = 8765,
+    raw_csv_path: Optional[Path] = RAW_DIR / "live_payloads.csv",
+    stats: Optional[StageStats] = None,
+    checkpoint_path: Optional[str] = CHECKPOINT_PATH
+):
+    """
+    Single-process service loop.
+
+    handler_factory replaces BLEHandler with any source taking the same
+    (data_callback, gap_callback) keywords, e.g. a synthetic or recorded stream for soak
+    runs. When stats is given, stage latencies and buffer/queue/client gauges are recorded.
+    With checkpoint_path set, the partial frame and last dashboard state are snapshotted
+    periodically and restored on startup if the snapshot is recent; the restored partial
+    frame continues across the restart gap, which is recorded in the frame.
+    """
     queue = asyncio.Queue()
     
     # Initialize processor with raw CSV path for streaming BLE payloads
-    raw_csv_file = RAW_DIR / "live_payloads.csv"
-    processor = DataProcessor(queue, raw_csv_path=str(raw_csv_file))
+    processor = DataProcessor(
+        queue, raw_csv_path=str(raw_csv_path) if raw_csv_path else None, detector=MicrosleepDetector()
+    )
     
-    handler = BLEHandler(data_callback=processor.process_data)
+    handler = (handler_factory or BLEHandler)(data_callback=processor.process_data, gap_callback=processor.mark_gap)
     extractor = FeatureExtractor(sample_rate=SAMPLE_RATE, blink_threshold=BLINK_THRESHOLD, nod_threshold=NOD_THRESHOLD)
 
     # Load baseline
@@ -37,31 +143,53 @@ async def main():
     # Load or train HMM models
     alert_model, drowsy_model = load_models()
 
-    start_time = time.time()
-
     # State dict for dashboard
-    state = {
-        "connected": False,
-        "duration": 0.0,
-        "status": "Unknown",
-        "metrics": {"avg_accel": 0.0, "blink_duration": 0.0, "nod_freq": 0.0}
-    }
+    state = {"duration": 0.0, **new_device_state()}
+
+    # Warm restart: resume the partial frame and last decision instead of starting blind
+    checkpoint = CheckpointManager(checkpoint_path) if checkpoint_path else None
+    start_time = restore_checkpoint(checkpoint, state, processor)
+    checkpoint_task = asyncio.create_task(persist_checkpoint(
+        checkpoint, lambda: {"processor": processor.snapshot(), "state": dict(state)}
+    )) if checkpoint else None
 
     # Start BLE listener
     bluetooth_task = asyncio.create_task(handler.connect_and_subscribe())
 
     # Start WebSocket server (Using 0.0.0.0 for broader network compatibility)
-    ws_server = WebSocketServer(host="0.0.0.0") 
+    history = StateHistory(path=HISTORY_PATH)
+    ws_server = WebSocketServer(host="0.0.0.0", port=ws_port, history=history)
     ws_task = asyncio.create_task(ws_server.start())
+    history_task = asyncio.create_task(persist_history(history)) if HISTORY_PATH else None
+
+    # Adaptive cadence: back off scoring and broadcasts while confidently alert
+    # (disabled = fixed cadence: every frame scored, broadcast every second)
+    cadence = AdaptiveCadence() if ADAPTIVE_CADENCE else AdaptiveCadence(max_latency_s=0, max_broadcast_s=1.0)
+
+    # Fast-path events skip framing and scoring and go out to dashboards immediately
+    def on_event(event):
+        state["last_event"] = event
+        cadence.on_event(event)
+        asyncio.create_task(publish_event(ws_server, event))
+
+    processor.event_callback = on_event
 
     # Periodically broadcast state to dashboards
     async def broadcast_state():
         while True:
+            cpu_started = time.process_time()
             try:
                 await ws_server.broadcast(state)
             except Exception as e:
                 logger.debug(f"Broadcast error: {e}")
-            await asyncio.sleep(1)
+            cadence.record_broadcast(time.process_time() - cpu_started)
+            if stats is not None:
+                stats.gauge("buffer_rows", len(processor.buffer))
+                stats.gauge("queue_size", queue.qsize())
+                stats.gauge("ws_clients", len(ws_server.clients))
+                stats.gauge("rx_buffer_chars", len(getattr(handler, "_rx_buffer", "")))
+                stats.gauge("tasks", len(asyncio.all_tasks()))
+            await cadence.wait_broadcast()
     
     broadcast_task = asyncio.create_task(broadcast_state())
 
@@ -69,45 +197,50 @@ async def main():
         while True:
             frame = await queue.get()
 
-            # Feature extraction
-            avg_accel = extractor.getAvgAccelScalar(frame)
-            blink_duration = extractor.getBlinkScalar(frame)
-            nod_freq = extractor.getNodFreqScalar(frame)
-
-            # Include nod frequency for HMM prediction
-            features = {
-                "avg_blink_duration_ms": blink_duration,
-                "avg_accel_ay": avg_accel,
-                "nod_freq_hz": nod_freq
-            }
-
-            # HMM prediction: pass [blink_duration, nod_freq, avg_accel] (3-element vector)
-            state_prediction = predict_state([blink_duration, nod_freq, avg_accel], alert_model, drowsy_model)
-
-            # Determine driver state
-            if state_prediction == "Drowsy":
-                driver_status = "Danger"
-            elif blink_duration < 300 or avg_accel > 0.3:
-                driver_status = "Be careful"
-            else:
-                driver_status = "Looking good"
+            if not cadence.should_score():
+                state["duration"] = round(time.time() - start_time, 1)
+                queue.task_done()
+                continue
 
-            # Update dashboard state (connected status visible here)
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            result = analyze_frame(frame, extractor, alert_model, drowsy_model)
+            cadence.observe(result, time.process_time() - cpu_started)
+            if stats is not None:
+                stats.record("analyze", time.perf_counter() - started)
+                if "framed_at" in frame.attrs:
+                    stats.record("queue_wait", started - frame.attrs["framed_at"])
+
+            # Update dashboard state (connected status visible here); a sensor-fault frame
+            # has no metrics, so the last scored ones stay on the dashboard
             state.update({
                 "connected": handler.client.is_connected if handler.client else False,
                 "duration": round(time.time() - start_time, 1),
-                "status": driver_status,
-                "metrics": {"avg_accel": avg_accel, "blink_duration": blink_duration, "nod_freq": nod_freq}
+                "status": result["status"],
+                "metrics": result["metrics"] or state["metrics"],
+                "sensor_faults": result["faults"]
             })
+            history.record(time.time(), result["status"], state["metrics"])
 
             logger.info(f"State: {state}")
+            logger.debug(f"Cadence: {cadence.report()}")
 
             queue.task_done()
 
     except asyncio.CancelledError:
         logger.info("Controller cancelled.")
     finally:
+        logger.info(f"Cadence CPU report: {cadence.report()}")
         await handler.stop()
+        if checkpoint_task:
+            checkpoint_task.cancel()
+            try:
+                checkpoint.write({"processor": processor.snapshot(), "state": dict(state)})
+            except Exception as e:
+                logger.warning(f"Failed to write final checkpoint: {e}")
+        if history_task:
+            history_task.cancel()
+            history.save()
         broadcast_task.cancel()
         ws_task.cancel()
         bluetooth_task.cancel()
@@ -124,5 +257,152 @@ async def main():
         except asyncio.CancelledError:
             pass
 
+
+def _next_result(results, timeout: float):
+    """Blocking get used from a worker thread so the event loop never waits on the queue."""
+    try:
+        return results.get(timeout=timeout)
+    except queue_module.Empty:
+        return None
+
+async def main_multiprocess(devices=(DEVICE_NAME,), workers: int = ANALYTICS_WORKERS,
+                            raw_csv_path: Optional[Path] = RAW_DIR / "live_payloads.csv"):
+    """
+    Multi-process layout: an ingest process owns BLE and writes samples into one shared-memory
+    ring per device, analytics processes score zero-copy frames from those rings, and this
+    process owns the WebSocket server and publishes their results. The broadcast state,
+    history and checkpoint are keyed by device, so one driver's status never overwrites another's.
+
+    Analytics processes are restarted if they die; the ingest process (and its BLE
+    connection) is unaffected because it only ever talks to the rings.
+    """
+    if load_baseline() is None:
+        raise RuntimeError("Baseline not found. Please create it before starting.")
+
+    ctx = mp.get_context("spawn")
+    capacity = FRAME_SIZE * RING_CAPACITY_FRAMES
+    rings = {device: SharedRingBuffer.create(capacity) for device in devices}
+    ring_names = {device: ring.name for device, ring in rings.items()}
+    results = ctx.Queue()
+
+    # The ingest process records raw samples like DataProcessor: one CSV per device when there are several
+    raw_csv_paths = {
+        device: str(raw_csv_path) if len(devices) == 1 else device_path(str(raw_csv_path), device) for device in devices
+    } if raw_csv_path else {}
+    ingest_args = (ring_names, capacity, results, raw_csv_paths)
+    ingest = ctx.Process(target=run_ingest, args=ingest_args, name="iris-ingest", daemon=True)
+    ingest.start()
+
+    # Spread devices over the analytics workers. A device's frames are scored in order by a
+    # single worker, so there is no use for more workers than devices.
+    if workers > len(ring_names):
+        logger.warning(f"{workers} analytics workers requested for {len(ring_names)} device(s); "
+                       f"starting {len(ring_names)}, one per device")
+    workers = max(1, min(workers, len(ring_names)))
+    partitions = [dict(list(ring_names.items())[i::workers]) for i in range(workers)]
+
+    def start_analytics(i: int):
+        proc = ctx.Process(
+            target=run_analytics, args=(partitions[i], capacity, FRAME_SIZE, results),
+            name=f"iris-analytics-{i}", daemon=True
+        )
+        proc.start()
+        return proc
+
+    analytics = [start_analytics(i) for i in range(workers)]
+
+    # Each device is a separate driver: its status, metrics and history are kept apart.
+    # The top-level fields mirror the first device, so single-device dashboards keep working.
+    primary = devices[0]
+    state = {"connected": False, "duration": 0.0, "devices": {device: new_device_state() for device in devices}}
+
+    # Frames live in shared memory and restart with the processes; only the decision state is checkpointed
+    checkpoint = CheckpointManager(CHECKPOINT_PATH) if CHECKPOINT_PATH else None
+    start_time = restore_checkpoint(checkpoint, state)
+    state["devices"] = {device: {**new_device_state(), **state["devices"].get(device, {})} for device in devices}
+    mirror_device(state, primary)
+    checkpoint_task = asyncio.create_task(
+        persist_checkpoint(checkpoint, lambda: {"state": dict(state)})
+    ) if checkpoint else None
+
+    histories = {
+        device: StateHistory(path=device_path(HISTORY_PATH, device) if HISTORY_PATH else None) for device in devices
+    }
+    ws_server = WebSocketServer(host="0.0.0.0", history=histories)
+    ws_task = asyncio.create_task(ws_server.start())
+    history_tasks = [asyncio.create_task(persist_history(history)) for history in histories.values()] if HISTORY_PATH else []
+
+    async def broadcast_state():
+        while True:
+            try:
+                await ws_server.broadcast(state)
+            except Exception as e:
+                logger.debug(f"Broadcast error: {e}")
+            await asyncio.sleep(1)
+
+    broadcast_task = asyncio.create_task(broadcast_state())
+    loop = asyncio.get_running_loop()
+
+    try:
+        while True:
+            result = await loop.run_in_executor(None, _next_result, results, 0.5)
+
+            # Supervise: a crashed analytics worker is replaced, BLE ingest keeps running
+            for i, proc in enumerate(analytics):
+                if not proc.is_alive():
+                    logger.warning(f"{proc.name} exited with code {proc.exitcode}; restarting")
+                    analytics[i] = start_analytics(i)
+            if not ingest.is_alive():
+                logger.error(f"Ingest process exited with code {ingest.exitcode}; restarting")
+                ingest = ctx.Process(target=run_ingest, args=ingest_args, name="iris-ingest", daemon=True)
+                ingest.start()
+
+            for device, ring in rings.items():
+                state["devices"][device]["connected"] = ring.connected
+            state["connected"] = any(ring.connected for ring in rings.values())
+            state["duration"] = round(time.time() - start_time, 1)
+            if result is None:
+                continue
+            device_state = update_device_state(state, result)
+            if result["device"] == primary:
+                mirror_device(state, primary)
+            if result.get("type") == "event":
+                # Fast-path event from the ingest process: publish without waiting for a frame
+                asyncio.create_task(publish_event(ws_server, result))
+            else:
+                histories[result["device"]].record(result["timestamp"], result["status"], device_state["metrics"])
+                logger.info(f"[{result['device']}] State: {device_state}")
+
+    except asyncio.CancelledError:
+        logger.info("Controller cancelled.")
+    finally:
+        if checkpoint_task:
+            checkpoint_task.cancel()
+            try:
+                checkpoint.write({"state": dict(state)})
+            except Exception as e:
+                logger.warning(f"Failed to write final checkpoint: {e}")
+        for task in history_tasks:
+            task.cancel()
+        if history_tasks:
+            for history in histories.values():
+                history.save()
+        broadcast_task.cancel()
+        ws_task.cancel()
+        for proc in [ingest, *analytics]:
+            proc.terminate()
+        for proc in [ingest, *analytics]:
+            proc.join(timeout=5)
+        for task in (broadcast_task, ws_task):
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for device, ring in rings.items():
+            if ring.malformed:
+                logger.info(f"[{device}] Skipped {ring.malformed} malformed payload(s)")
+            ring.close()
+            ring.unlink()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
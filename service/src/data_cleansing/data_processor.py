@@ -1,20 +1,46 @@
 import asyncio
-import json
-import io
+import time
+import numpy as np
 import pandas as pd
 import logging
 from pathlib import Path
-from typing import List, Dict, Union, Optional
-from ..config import FRAME_SIZE  # Number of rows per frame
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from ..config import FRAME_SIZE, GAP_MIN_FRAME_ROWS  # Number of rows per frame, shortest frame scored at a gap
+from .parser import parse_payload
+from .schema import FRAME_COLUMNS, FRAME_DTYPE, append_csv, to_records
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DataProcessor:
-    def __init__(self, queue: asyncio.Queue, frame_size: int = FRAME_SIZE, raw_csv_path: Optional[str] = None):
+    def __init__(
+        self,
+        queue: asyncio.Queue,
+        frame_size: int = FRAME_SIZE,
+        raw_csv_path: Optional[str] = None,
+        detector=None,
+        event_callback: Optional[Callable[[Dict], None]] = None,
+        min_gap_frame: int = GAP_MIN_FRAME_ROWS
+    ):
         self.queue = queue
-        self.buffer: List[Dict] = []
         self.frame_size = frame_size
+        self.min_gap_frame = min_gap_frame
+
+        # Partially filled frame as packed schema records (FRAME_DTYPE), reused frame after frame
+        self._records = np.empty(frame_size, dtype=FRAME_DTYPE)
+        self._filled = 0
+
+        # Optional per-sample fast path (e.g. MicrosleepDetector) that bypasses framing
+        self.detector = detector
+        self.event_callback = event_callback
+
+        # Text lines that did not match the channel schema
+        self.malformed_lines = 0
+
+        # Stream gaps (BLE disconnects, restarts) seen so far
+        self.gap_count = 0
+        self.gap_seconds = 0.0
+        self._frame_gaps: List[Tuple[int, float]] = []  # (row, seconds) gaps bridged inside the current frame
         
         # Initialize raw CSV file for streaming payloads
         self.raw_csv_path = None
@@ -23,53 +49,111 @@ class DataProcessor:
             self.raw_csv_path.parent.mkdir(parents=True, exist_ok=True)
             logger.info(f"Raw CSV stream initialized: {self.raw_csv_path}")
 
-    def process_data(self, data: Union[str, dict]):
+    @property
+    def buffer(self) -> np.ndarray:
+        """Rows of the frame being filled (structured FRAME_DTYPE view)."""
+        return self._records[:self._filled]
+
+    def process_data(self, data: Union[str, dict, list]):
         """
-        Accept either a dict (parsed JSON) or a newline-delimited JSON/CSV string.
-        Normalize column names (ir → photodiode_value) for feature extraction compatibility.
-        Write raw payload to CSV file. Build small DataFrame chunks and append rows 
-        to internal buffer. When buffer >= frame_size, queue a DataFrame frame.
+        Accept a dict or list of dicts (parsed JSON) or a newline-delimited JSON/CSV string.
+        Both are parsed against the declared channel schema (SENSOR_CHANNELS) and converted
+        once to its compact dtypes (schema.FRAME_DTYPE, ir stored as photodiode_value for
+        feature extraction compatibility); malformed payloads are counted in malformed_lines and skipped.
+        Write the typed rows to the raw CSV file and append them to the internal buffer.
+        When buffer >= frame_size, queue a DataFrame frame.
+        Each sample is also fed to the fast-path detector, whose events go straight
+        to event_callback without waiting for the frame.
         """
-        # Accept pre-parsed JSON dict
-        if isinstance(data, dict):
-            df_chunk = pd.DataFrame([data])
-            # Normalize column names: ir → photodiode_value
-            if 'ir' in df_chunk.columns and 'photodiode_value' not in df_chunk.columns:
-                df_chunk.rename(columns={'ir': 'photodiode_value'}, inplace=True)
-            
-            # Write raw dict to CSV
-            if self.raw_csv_path:
-                try:
-                    df_chunk.to_csv(self.raw_csv_path, mode='a', header=not self.raw_csv_path.exists(), index=False)
-                except Exception as e:
-                    logger.warning(f"Failed to write raw CSV: {e}")
-        else:
-            # try JSON string first, then CSV fallback
+        received_at = time.time()
+        # Schema-aware fast path: parsed JSON or JSON/firmware-order CSV lines straight into typed rows
+        rows, bad = parse_payload(data)
+        if bad:
+            self.malformed_lines += bad
+            logger.debug(f"Skipped {bad} malformed payload(s); {self.malformed_lines} so far")
+        if not len(rows):
+            return
+        records = to_records(rows)
+
+        # Write raw samples to CSV
+        if self.raw_csv_path:
             try:
-                obj = json.loads(data)
-                df_chunk = pd.DataFrame([obj]) if isinstance(obj, dict) else pd.DataFrame(obj)
-                # Normalize column names
-                if 'ir' in df_chunk.columns and 'photodiode_value' not in df_chunk.columns:
-                    df_chunk.rename(columns={'ir': 'photodiode_value'}, inplace=True)
-                
-                # Write parsed JSON to CSV
-                if self.raw_csv_path:
-                    try:
-                        df_chunk.to_csv(self.raw_csv_path, mode='a', header=not self.raw_csv_path.exists(), index=False)
-                    except Exception as e:
-                        logger.warning(f"Failed to write raw CSV: {e}")
-            except (json.JSONDecodeError, TypeError):
-                df_chunk = pd.read_csv(io.StringIO(data), header=None)
-
-        # append rows to internal buffer
-        for _, row in df_chunk.iterrows():
-            self.buffer.append(row.to_dict())
-
-        # when we have enough rows, create and enqueue a frame
-        while len(self.buffer) >= self.frame_size:
-            frame_df = pd.DataFrame(self.buffer[:self.frame_size])
-            self.buffer = self.buffer[self.frame_size:]
-            asyncio.create_task(self._queue_frame(frame_df))
+                append_csv(self.raw_csv_path, records)
+            except Exception as e:
+                logger.warning(f"Failed to write raw CSV: {e}")
+
+        if self.detector is not None:
+            for sample in records.tolist():
+                event = self.detector.update(dict(zip(FRAME_COLUMNS, sample)), received_at)
+                if event is not None and self.event_callback is not None:
+                    self.event_callback(event)
+
+        # append rows to internal buffer, queuing a frame each time it fills up
+        while len(records):
+            take = min(len(records), self.frame_size - self._filled)
+            self._records[self._filled:self._filled + take] = records[:take]
+            self._filled += take
+            records = records[take:]
+            if self._filled == self.frame_size:
+                self._close_frame()
+
+    def _close_frame(self):
+        """Queue the buffered rows as a frame and start a new one."""
+        frame_df = pd.DataFrame(self._records[:self._filled])
+        frame_df.attrs["framed_at"] = time.perf_counter()
+        frame_df.attrs["gaps"] = self._frame_gaps
+        self._filled = 0
+        self._frame_gaps = []
+        asyncio.create_task(self._queue_frame(frame_df))
+
+    def mark_gap(self, duration_s: float = 0.0):
+        """
+        Mark a break in the sample stream (e.g. a BLE reconnect).
+
+        The partial frame is closed at the gap so the next frame only contains contiguous
+        data: it is queued as a short frame when it holds at least `min_gap_frame` rows
+        (features are rates and averages, so they stay comparable), and dropped otherwise.
+        Fast-path run state is reset so a closure cannot span the gap.
+        """
+        buffered = self._filled
+        if buffered >= self.min_gap_frame:
+            self._close_frame()
+            logger.warning(f"Stream gap of {duration_s:.2f} s; scoring the {buffered}-row partial frame before it")
+        else:
+            self._filled = 0
+            self._frame_gaps = []
+            logger.warning(f"Stream gap of {duration_s:.2f} s; dropped {buffered} buffered rows (too few to score)")
+        if self.detector is not None:
+            self.detector.reset()
+        self.gap_count += 1
+        self.gap_seconds += duration_s
+
+    def bridge_gap(self, duration_s: float):
+        """
+        Mark a short break that the partial frame continues across, e.g. a warm restart from
+        a checkpoint younger than CHECKPOINT_MAX_AGE_S, so the next decision comes when the
+        frame fills rather than a whole frame after reconnecting. The gap's row and length
+        are kept in the frame's `attrs["gaps"]`; fast-path run state is reset as in `mark_gap()`.
+        """
+        self._frame_gaps.append((self._filled, duration_s))
+        if self.detector is not None:
+            self.detector.reset()
+        self.gap_count += 1
+        self.gap_seconds += duration_s
+        logger.info(f"Stream gap of {duration_s:.2f} s bridged at row {self._filled} of the partial frame")
+
+    def snapshot(self) -> Dict:
+        """
+        Partially filled frame (typed records) for warm restarts. Fast-path run state is not
+        saved: a restart is a stream gap, so `restore()` is followed by `bridge_gap()`.
+        """
+        return {"buffer": self.buffer.copy()}
+
+    def restore(self, snapshot: Dict):
+        buffer = snapshot["buffer"]
+        self._filled = min(len(buffer), self.frame_size)
+        self._records[:self._filled] = buffer[:self._filled]
+        logger.info(f"Restored {len(self.buffer)} buffered rows of a {self.frame_size}-row frame")
 
     async def _queue_frame(self, frame_df: pd.DataFrame):
         await self.queue.put(frame_df)
@@ -0,0 +1,93 @@
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from ..config import SENSOR_CHANNELS
+
+logger = logging.getLogger(__name__)
+
+# Column aliases accepted from dict payloads
+ALIASES = {"photodiode_value": "ir"}
+
+
+def row_from_dict(obj: Dict, channels: Sequence[str] = SENSOR_CHANNELS) -> Optional[List[float]]:
+    """Pick `channels` out of a firmware JSON object; missing keys become NaN, bad values reject the row."""
+    if not ALIASES.keys().isdisjoint(obj):
+        obj = {ALIASES.get(k, k): v for k, v in obj.items()}
+    try:
+        return [float(obj.get(c, "nan")) for c in channels]
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_line(line: str, channels: Sequence[str] = SENSOR_CHANNELS) -> Optional[List[List[float]]]:
+    """
+    Parse one text payload: a JSON object, a JSON list of objects, or a CSV line in
+    firmware column order. Returns the rows it contains, or None if it is malformed.
+    """
+    text = line.strip()
+    if not text:
+        return []
+    if text[0] in "{[":
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        objs = obj if isinstance(obj, list) else [obj]
+        rows = [row_from_dict(o, channels) if isinstance(o, dict) else None for o in objs]
+        return None if any(r is None for r in rows) else rows
+    parts = text.split(",")
+    if len(parts) != len(channels):
+        return None
+    try:
+        return [[float(p) for p in parts]]
+    except ValueError:
+        return None
+
+
+def parse_lines(lines: Iterable[str], channels: Sequence[str] = SENSOR_CHANNELS) -> Tuple[np.ndarray, int]:
+    """
+    Convert a batch of text payloads into a (n, len(channels)) float32 array in schema order
+    (missing values NaN), ready for schema.to_records.
+
+    Pure CSV batches are split and converted by NumPy in one call; a batch that contains
+    JSON or malformed lines falls back to per-line parsing. Malformed lines are skipped
+    and counted instead of raising. Returns (rows, n_malformed).
+    """
+    lines = [l for l in (line.strip() for line in lines) if l]
+    n_channels = len(channels)
+    if not lines:
+        return np.empty((0, n_channels), dtype=np.float32), 0
+    if lines[0][0] not in "{[":
+        try:
+            rows = np.array([l.split(",") for l in lines], dtype=np.float32)
+            if rows.ndim == 2 and rows.shape[1] == n_channels:
+                return rows, 0
+        except ValueError:
+            pass
+
+    rows, bad = [], 0
+    for line in lines:
+        parsed = parse_line(line, channels)
+        if parsed is None:
+            bad += 1
+        else:
+            rows.extend(parsed)
+    if bad:
+        logger.debug(f"Skipped {bad} malformed line(s) of {len(lines)}")
+    return np.array(rows, dtype=np.float32).reshape(-1, n_channels), bad
+
+
+def parse_payload(payload: Union[str, Dict, List], channels: Sequence[str] = SENSOR_CHANNELS) -> Tuple[np.ndarray, int]:
+    """
+    Convert one payload as BLEHandler delivers it: a parsed JSON object, a parsed JSON array
+    of objects (a batched notification), or newline-delimited JSON/CSV text.
+    Returns (rows, n_malformed) like parse_lines; bad array elements are counted one by one.
+    """
+    if isinstance(payload, dict):
+        payload = [payload]
+    if isinstance(payload, list):
+        rows = [row_from_dict(obj, channels) if isinstance(obj, dict) else None for obj in payload]
+        good = [row for row in rows if row is not None]
+        return np.array(good, dtype=np.float32).reshape(-1, len(channels)), len(rows) - len(good)
+    return parse_lines(str(payload).splitlines(), channels)
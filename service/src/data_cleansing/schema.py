@@ -0,0 +1,69 @@
+"""
+Declared channel schema: one compact storage dtype per sensor channel (CHANNEL_DTYPES).
+
+Samples are converted once, at ingest, and stay in these dtypes through framing, recording,
+the shared-memory ring and feature extraction; only statistics that need the precision
+accumulate in float64. A sample is 26 bytes instead of 56 as float64, or several hundred
+as a dict of Python floats.
+"""
+from pathlib import Path
+from typing import Sequence
+import numpy as np
+import pandas as pd
+from .parser import ALIASES
+from ..config import SENSOR_CHANNELS, CHANNEL_DTYPES, IR_MISSING
+
+# Frame column names: firmware channels with ir normalized to photodiode_value
+FRAME_COLUMNS = tuple("photodiode_value" if c == "ir" else c for c in SENSOR_CHANNELS)
+
+
+def channel_dtype(name: str) -> np.dtype:
+    return np.dtype(CHANNEL_DTYPES[ALIASES.get(name, name)])
+
+
+def record_dtype(names: Sequence[str]) -> np.dtype:
+    """Packed structured dtype for one sample with fields `names`."""
+    return np.dtype([(n, channel_dtype(n)) for n in names])
+
+
+SAMPLE_DTYPE = record_dtype(SENSOR_CHANNELS)
+FRAME_DTYPE = record_dtype(FRAME_COLUMNS)
+
+# Recording format per frame column: integers as-is, float32 with the digits it actually holds
+CSV_FORMATS = ["%d" if channel_dtype(n).kind == "i" else "%.7g" for n in FRAME_COLUMNS]
+
+
+def cast_column(name: str, values: np.ndarray) -> np.ndarray:
+    """Convert float readings of one channel to its storage dtype (integer channels: rounded, NaN -> IR_MISSING)."""
+    dtype = channel_dtype(name)
+    if dtype.kind != "i":
+        return np.asarray(values, dtype=dtype)
+    values = np.asarray(values, dtype=np.float32)
+    info = np.iinfo(dtype)
+    with np.errstate(invalid="ignore"):
+        out = np.clip(np.rint(values), info.min, info.max).astype(dtype)
+    out[np.isnan(values)] = IR_MISSING
+    return out
+
+
+def to_records(rows: np.ndarray, dtype: np.dtype = FRAME_DTYPE) -> np.ndarray:
+    """Rows of floats, shape (n, len(dtype.names)) in field order, as a structured array of `dtype`."""
+    rows = np.asarray(rows, dtype=np.float32).reshape(-1, len(dtype.names))
+    out = np.empty(len(rows), dtype=dtype)
+    for i, name in enumerate(dtype.names):
+        out[name] = cast_column(name, rows[:, i])
+    return out
+
+
+def typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the schema columns of a float frame (e.g. a recording read from CSV) to their storage dtypes."""
+    known = set(CHANNEL_DTYPES) | set(ALIASES)
+    return df.assign(**{c: cast_column(c, df[c].to_numpy(dtype=np.float32)) for c in df.columns if c in known})
+
+
+def append_csv(path: Path, records: np.ndarray):
+    """Append FRAME_DTYPE records to a recording CSV, writing the FRAME_COLUMNS header if the file is new."""
+    write_header = not path.exists()
+    with path.open("a") as f:
+        np.savetxt(f, records, fmt=CSV_FORMATS, delimiter=",",
+                   header=",".join(FRAME_COLUMNS) if write_header else "", comments="")
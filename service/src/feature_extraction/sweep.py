@@ -0,0 +1,215 @@
+"""
+Vectorized threshold/window sweeps for calibrating BLINK_THRESHOLD, NOD_THRESHOLD and FRAME_SIZE.
+
+Each function computes the same scalar as the matching FeatureExtractor method, but for every
+candidate threshold at once (broadcast over a leading threshold axis) and for every window of
+a recording at once, so one pass per recording covers the whole grid.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+from ..config import SENSOR_CHANNELS
+from ..data_cleansing.schema import typed_frame
+
+logger = logging.getLogger(__name__)
+
+
+def _windows(values: np.ndarray, window_size: int) -> np.ndarray:
+    """Non-overlapping windows, shape (n_windows, window_size); the incomplete tail is dropped."""
+    n = len(values) // window_size
+    return values[:n * window_size].reshape(n, window_size)
+
+
+def blink_durations_ms(ir: np.ndarray, thresholds: np.ndarray, sample_rate: float) -> np.ndarray:
+    """
+    Average blink duration (ms) per threshold and window, as FeatureExtractor.getBlinkScalar.
+
+    ir: (n_windows, window_size); thresholds: (k,). Returns (k, n_windows).
+    The mean run length is total below-threshold samples / number of runs, so no run
+    lengths need to be materialized.
+    """
+    below = ir[None, :, :] < thresholds[:, None, None]                     # (k, m, w)
+    starts = below.copy()
+    starts[:, :, 1:] &= ~below[:, :, :-1]
+    n_runs = starts.sum(axis=2)
+    n_below = below.sum(axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n_runs > 0, n_below / n_runs / sample_rate * 1000, 0.0)
+
+
+def nod_frequencies_hz(gz: np.ndarray, thresholds: np.ndarray, sample_rate: float) -> np.ndarray:
+    """
+    Nodding frequency (Hz) per threshold and window, as FeatureExtractor.getNodFreqScalar.
+
+    Local maxima of |gz| are found once per window; each threshold then only filters them
+    by height. gz: (n_windows, window_size); thresholds: (k,). Returns (k, n_windows).
+    """
+    distance = sample_rate / 10
+    out = np.zeros((len(thresholds), len(gz)))
+    for j, window in enumerate(np.abs(gz)):
+        if distance > 1:
+            # Peak spacing depends on which peaks survive the height filter: no shortcut
+            for i, threshold in enumerate(thresholds):
+                peaks, _ = find_peaks(window, height=threshold, distance=distance)
+                if len(peaks) >= 2 and peaks[-1] > peaks[0]:
+                    out[i, j] = (len(peaks) - 1) / ((peaks[-1] - peaks[0]) / sample_rate)
+            continue
+        peaks, _ = find_peaks(window)
+        if len(peaks) < 2:
+            continue
+        keep = window[peaks][None, :] >= thresholds[:, None]               # (k, p)
+        count = keep.sum(axis=1)
+        first = peaks[np.argmax(keep, axis=1)]
+        last = peaks[len(peaks) - 1 - np.argmax(keep[:, ::-1], axis=1)]
+        span = (last - first) / sample_rate
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[:, j] = np.where((count >= 2) & (span > 0), (count - 1) / span, 0.0)
+    return out
+
+
+def load_recording(path: str) -> pd.DataFrame:
+    """
+    Read a recorded CSV, with or without a header row (header-less files use firmware column order),
+    into the schema dtypes.
+    """
+    df = pd.read_csv(path, header=None)
+    if len(df) and not pd.api.types.is_numeric_dtype(df.dtypes.iloc[0]):
+        df = pd.read_csv(path)
+    elif df.shape[1] == len(SENSOR_CHANNELS):
+        df.columns = list(SENSOR_CHANNELS)
+    return typed_frame(df.rename(columns={"photodiode_value": "ir"}))
+
+
+def sweep_recording(path: str, blink_thresholds: Sequence[float], nod_thresholds: Sequence[float],
+                    window_sizes: Sequence[int], sample_rate: float) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    Features of one recording for the whole grid.
+    Returns {window_size: {"blink": (kb, m), "nod": (kn, m), "accel": (m,)}}.
+    """
+    df = load_recording(path)
+    # Schema dtypes as stored; thresholds compare against int16 IR without a float copy
+    ir = df["ir"].to_numpy()
+    ay = df["ay"].to_numpy()
+    gz = df["gz"].to_numpy()
+    blink_thresholds = np.asarray(blink_thresholds, dtype=np.float64)
+    nod_thresholds = np.asarray(nod_thresholds, dtype=np.float64)
+    result = {}
+    for w in window_sizes:
+        result[w] = {
+            "blink": blink_durations_ms(_windows(ir, w), blink_thresholds, sample_rate),
+            "nod": nod_frequencies_hz(_windows(gz, w), nod_thresholds, sample_rate),
+            "accel": np.nanmean(_windows(ay, w), axis=1, dtype=np.float64) if len(ay) >= w else np.empty(0),
+        }
+    return result
+
+
+def _fisher(a: np.ndarray, b: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Fisher separability (mu_a - mu_b)^2 / (var_a + var_b) along `axis`."""
+    if a.shape[axis] == 0 or b.shape[axis] == 0:
+        return np.full(np.delete(a.shape, axis), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (a.mean(axis) - b.mean(axis)) ** 2 / (a.var(axis) + b.var(axis))
+
+
+def _diag_log_likelihood(model, X: np.ndarray) -> np.ndarray:
+    """Per-row score of a single-state diagonal GaussianHMM, i.e. model.score(x[None]) for every x in X."""
+    means = model.means_[0]
+    variances = np.diagonal(model.covars_[0])
+    return -0.5 * (np.sum(np.log(2 * np.pi * variances)) + np.sum((X - means) ** 2 / variances, axis=-1))
+
+
+def drowsy_rates(blink: np.ndarray, nod: np.ndarray, accel: np.ndarray, alert_model, drowsy_model) -> np.ndarray:
+    """
+    Fraction of windows predict_state would call "Drowsy", for every (blink threshold, nod threshold).
+    blink: (kb, m), nod: (kn, m), accel: (m,). Returns (kb, kn).
+    """
+    if alert_model.n_components != 1 or drowsy_model.n_components != 1 or alert_model.covariance_type != "diag":
+        raise ValueError("Vectorized scoring needs single-state diagonal GaussianHMMs")
+    if blink.shape[1] == 0:
+        return np.full((len(blink), len(nod)), np.nan)
+    rates = np.empty((len(blink), len(nod)))
+    for i, b in enumerate(blink):
+        X = np.stack(np.broadcast_arrays(b[None, :], nod, accel[None, :]), axis=-1)   # (kn, m, 3)
+        drowsy = _diag_log_likelihood(alert_model, X) <= _diag_log_likelihood(drowsy_model, X)
+        rates[i] = drowsy.mean(axis=1)
+    return rates
+
+
+def _describe(values: np.ndarray, prefix: str) -> Dict[str, np.ndarray]:
+    """Per-row distribution summary of a (k, m) array."""
+    if values.shape[-1] == 0:
+        nan = np.full(values.shape[:-1], np.nan)
+        return {f"{prefix}_{s}": nan for s in ("mean", "std", "p10", "p50", "p90")}
+    p10, p50, p90 = np.percentile(values, [10, 50, 90], axis=-1)
+    return {f"{prefix}_mean": values.mean(-1), f"{prefix}_std": values.std(-1),
+            f"{prefix}_p10": p10, f"{prefix}_p50": p50, f"{prefix}_p90": p90}
+
+
+def run_sweep(alert_paths: Iterable[str], drowsy_paths: Iterable[str], blink_thresholds: Sequence[float],
+              nod_thresholds: Sequence[float], window_sizes: Sequence[int], sample_rate: float,
+              models=None, workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Evaluate the full (window size x blink threshold x nod threshold) grid over labelled recordings.
+
+    Recordings are processed in parallel across `workers` processes. Returns one row per
+    setting with per-class feature distributions, Fisher separability of each feature and,
+    when `models` = (alert_model, drowsy_model) is given, the drowsy-call rate per class.
+    """
+    alert_paths, drowsy_paths = list(alert_paths), list(drowsy_paths)
+    paths = alert_paths + drowsy_paths
+    blink_thresholds = np.asarray(blink_thresholds, dtype=np.float64)
+    nod_thresholds = np.asarray(nod_thresholds, dtype=np.float64)
+    n = len(paths)
+    logger.info(f"Sweeping {n} recording(s) over {len(window_sizes)} window sizes x "
+                f"{len(blink_thresholds)} blink x {len(nod_thresholds)} nod thresholds")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        per_recording = list(pool.map(
+            sweep_recording, paths, [blink_thresholds] * n, [nod_thresholds] * n, [window_sizes] * n, [sample_rate] * n
+        ))
+    labels = ["alert"] * len(alert_paths) + ["drowsy"] * len(drowsy_paths)
+
+    kb, kn = len(blink_thresholds), len(nod_thresholds)
+    frames: List[pd.DataFrame] = []
+    for w in window_sizes:
+        by_class = {}
+        for label in ("alert", "drowsy"):
+            parts = [r[w] for r, l in zip(per_recording, labels) if l == label]
+            by_class[label] = {
+                "blink": np.concatenate([p["blink"] for p in parts], axis=1) if parts else np.empty((kb, 0)),
+                "nod": np.concatenate([p["nod"] for p in parts], axis=1) if parts else np.empty((kn, 0)),
+                "accel": np.concatenate([p["accel"] for p in parts]) if parts else np.empty(0),
+            }
+        a, d = by_class["alert"], by_class["drowsy"]
+
+        # Blink features depend only on the blink threshold, nod only on the nod threshold:
+        # compute them on their own axis, then broadcast onto the (kb, kn) grid
+        grid = {
+            "window_size": np.full((kb, kn), w),
+            "blink_threshold": np.repeat(blink_thresholds[:, None], kn, axis=1),
+            "nod_threshold": np.repeat(nod_thresholds[None, :], kb, axis=0),
+            "windows_alert": np.full((kb, kn), a["accel"].shape[0]),
+            "windows_drowsy": np.full((kb, kn), d["accel"].shape[0]),
+        }
+        for label, feats in by_class.items():
+            for key, col in _describe(feats["blink"], f"blink_ms_{label}").items():
+                grid[key] = np.repeat(col[:, None], kn, axis=1)
+            for key, col in _describe(feats["nod"], f"nod_hz_{label}").items():
+                grid[key] = np.repeat(col[None, :], kb, axis=0)
+        blink_sep = _fisher(a["blink"], d["blink"])
+        nod_sep = _fisher(a["nod"], d["nod"])
+        grid["blink_separability"] = np.repeat(blink_sep[:, None], kn, axis=1)
+        grid["nod_separability"] = np.repeat(nod_sep[None, :], kb, axis=0)
+        grid["accel_separability"] = np.full((kb, kn), _fisher(a["accel"], d["accel"]))
+        grid["separability"] = np.nansum([grid["blink_separability"], grid["nod_separability"]], axis=0)
+
+        if models is not None:
+            alert_model, drowsy_model = models
+            grid["drowsy_rate_alert"] = drowsy_rates(a["blink"], a["nod"], a["accel"], alert_model, drowsy_model)
+            grid["drowsy_rate_drowsy"] = drowsy_rates(d["blink"], d["nod"], d["accel"], alert_model, drowsy_model)
+            grid["decision_gap"] = grid["drowsy_rate_drowsy"] - grid["drowsy_rate_alert"]
+
+        frames.append(pd.DataFrame({k: v.ravel() for k, v in grid.items()}))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,3 @@
+# Multi-process transport: shared-memory sample rings between ingest and analytics
+from .shared_ring import SharedRingBuffer
+from .workers import run_ingest, run_analytics
@@ -0,0 +1,188 @@
+import logging
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from ..config import SENSOR_CHANNELS
+from ..data_cleansing.schema import channel_dtype, record_dtype, to_records
+
+logger = logging.getLogger(__name__)
+
+# Header slots (int64) stored in front of the sample block
+_WRITE_INDEX = 0   # total number of samples ever written (monotonic)
+_CONNECTED = 1     # 1 while the ingest process holds a BLE connection
+_GAP_COUNT = 2     # total number of stream gaps (BLE reconnects) ever marked
+_MALFORMED = 3     # total number of payloads the ingest process could not parse
+_GAP_FIRST = 8     # write indices of the most recent gaps, a small ring of _GAP_SLOTS slots
+_GAP_SLOTS = 16
+_HEADER_SLOTS = _GAP_FIRST + _GAP_SLOTS
+
+
+class SharedRingBuffer:
+    """
+    Single-writer / multi-reader ring of decoded samples in `multiprocessing.shared_memory`.
+
+    The ingest process writes rows of `channels` (firmware column order) and bumps a
+    monotonic write index after each write. Samples are stored column by column, one
+    contiguous array per channel in its schema dtype (CHANNEL_DTYPES). Readers keep their
+    own absolute cursor and get windows as {channel: NumPy view} straight onto the shared
+    block, so framing a window for analytics costs no copy unless it wraps around the end
+    of the ring.
+
+    A view is only valid while the writer has not lapped it: check `is_valid(start)`
+    after using a window and drop the result if it returns False.
+    """
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int, channels: Sequence[str], owner: bool):
+        self._shm = shm
+        self.capacity = capacity
+        self.channels: Tuple[str, ...] = tuple(channels)
+        self._owner = owner
+        self.dtype = record_dtype(self.channels)
+        self._header = np.ndarray((_HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        self._columns: Optional[Dict[str, np.ndarray]] = {}
+        offset = self._header.nbytes
+        for c in self.channels:
+            self._columns[c] = np.ndarray((capacity,), dtype=channel_dtype(c), buffer=shm.buf, offset=offset)
+            offset += self._column_nbytes(capacity, c)
+
+    @staticmethod
+    def _column_nbytes(capacity: int, channel: str) -> int:
+        # Keep every column 8-byte aligned
+        return -(-capacity * channel_dtype(channel).itemsize // 8) * 8
+
+    @classmethod
+    def _nbytes(cls, capacity: int, channels: Sequence[str]) -> int:
+        return _HEADER_SLOTS * 8 + sum(cls._column_nbytes(capacity, c) for c in channels)
+
+    @classmethod
+    def create(cls, capacity: int, channels: Sequence[str] = SENSOR_CHANNELS, name: Optional[str] = None) -> "SharedRingBuffer":
+        """Allocate a new ring. The creating process is responsible for `unlink()`."""
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls._nbytes(capacity, channels))
+        ring = cls(shm, capacity, channels, owner=True)
+        ring._header[:] = 0
+        logger.info(f"Shared ring '{shm.name}' created: {capacity} rows x {len(ring.channels)} channels")
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, capacity: int, channels: Sequence[str] = SENSOR_CHANNELS) -> "SharedRingBuffer":
+        """Attach to a ring created by another process."""
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, capacity, channels, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def write_index(self) -> int:
+        return int(self._header[_WRITE_INDEX])
+
+    @property
+    def connected(self) -> bool:
+        return bool(self._header[_CONNECTED])
+
+    @connected.setter
+    def connected(self, value: bool):
+        self._header[_CONNECTED] = 1 if value else 0
+
+    @property
+    def malformed(self) -> int:
+        return int(self._header[_MALFORMED])
+
+    def count_malformed(self, n: int):
+        """Add `n` payloads that did not match the channel schema (single writer: the ingest process)."""
+        self._header[_MALFORMED] += n
+
+    @property
+    def gap_index(self) -> int:
+        """Write index at the most recent stream gap (0 if there was none)."""
+        count = int(self._header[_GAP_COUNT])
+        return int(self._header[_GAP_FIRST + (count - 1) % _GAP_SLOTS]) if count else 0
+
+    def mark_gap(self):
+        """
+        Record that the next sample written does not follow on from the previous one.
+        The gap slot is filled before the count is published, so readers never see a stale slot.
+        """
+        count = int(self._header[_GAP_COUNT])
+        self._header[_GAP_FIRST + count % _GAP_SLOTS] = self._header[_WRITE_INDEX]
+        self._header[_GAP_COUNT] = count + 1
+
+    def gaps_after(self, index: int) -> Optional[List[int]]:
+        """
+        Ascending write indices of the gaps after absolute index `index`.
+
+        Returns None when more than _GAP_SLOTS gaps were marked since and some of those
+        after `index` may already have been overwritten.
+        """
+        count = int(self._header[_GAP_COUNT])
+        kept = min(count, _GAP_SLOTS)
+        gaps = [int(self._header[_GAP_FIRST + i % _GAP_SLOTS]) for i in range(count - kept, count)]
+        if count > _GAP_SLOTS and gaps[0] > index:
+            return None
+        return [g for g in gaps if g > index]
+
+    def write(self, row: Sequence[float]):
+        """Append one sample. Publishes the new write index only after the row is stored."""
+        idx = int(self._header[_WRITE_INDEX])
+        record = to_records([row], self.dtype)[0]
+        for c, column in self._columns.items():
+            column[idx % self.capacity] = record[c]
+        self._header[_WRITE_INDEX] = idx + 1
+
+    def write_many(self, rows: np.ndarray):
+        """
+        Append a block of samples with at most two slice copies per channel.
+        `rows` is a float array of shape (n, n_channels) or a structured array of `dtype`.
+        """
+        rows = np.asarray(rows)
+        if rows.dtype != self.dtype:
+            rows = to_records(rows, self.dtype)
+        n = len(rows)
+        if n == 0:
+            return
+        if n > self.capacity:
+            rows = rows[-self.capacity:]
+            skipped = n - self.capacity
+        else:
+            skipped = 0
+        idx = int(self._header[_WRITE_INDEX]) + skipped
+        start = idx % self.capacity
+        first = min(len(rows), self.capacity - start)
+        for c, column in self._columns.items():
+            column[start:start + first] = rows[c][:first]
+            if first < len(rows):
+                column[:len(rows) - first] = rows[c][first:]
+        self._header[_WRITE_INDEX] = idx + len(rows)
+
+    def is_valid(self, start: int) -> bool:
+        """True while the sample at absolute index `start` has not been overwritten."""
+        return self.write_index - start <= self.capacity
+
+    def window(self, start: int, n: int) -> Dict[str, np.ndarray]:
+        """
+        Return `n` rows starting at absolute index `start` as {channel: array}, in channel order.
+
+        Zero-copy views when the window is contiguous in the ring; copies when it wraps.
+        `pd.DataFrame(window, copy=False)` keeps the views and their dtypes.
+        """
+        if n > self.capacity:
+            raise ValueError(f"Window of {n} rows exceeds ring capacity {self.capacity}")
+        begin = start % self.capacity
+        if begin + n <= self.capacity:
+            return {c: column[begin:begin + n] for c, column in self._columns.items()}
+        end = begin + n - self.capacity
+        return {c: np.concatenate((column[begin:], column[:end])) for c, column in self._columns.items()}
+
+    def close(self):
+        # Drop our views before closing, otherwise the mmap refuses to close
+        self._header = None
+        self._columns = None
+        try:
+            self._shm.close()
+        except BufferError as e:
+            # A reader still holds a zero-copy view; the mapping is released when it is collected
+            logger.debug(f"Shared ring '{self._shm.name}' still referenced on close: {e}")
+
+    def unlink(self):
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import pandas as pd
+from .shared_ring import SharedRingBuffer
+from ..data_cleansing.parser import parse_payload
+from ..data_cleansing.schema import append_csv, to_records
+from ..config import SAMPLE_RATE, BLINK_THRESHOLD, NOD_THRESHOLD, GAP_MIN_FRAME_ROWS
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------
+# Ingest process
+# ------------------------
+class DeviceIngest:
+    """
+    Ingest path of one device, the multi-process counterpart of DataProcessor.process_data:
+    parses each BLE payload against the ring's channels, appends it to the raw recording CSV,
+    writes it into the ring and runs the fast-path detector. Malformed payloads are counted
+    in the ring header so the controller can report them.
+    """
+    def __init__(self, device: str, ring: SharedRingBuffer, detector=None, events=None,
+                 raw_csv_path: Optional[str] = None):
+        self.device = device
+        self.ring = ring
+        self.detector = detector
+        self.events = events
+        self.raw_csv_path = Path(raw_csv_path) if raw_csv_path else None
+        if self.raw_csv_path:
+            self.raw_csv_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def on_payload(self, payload):
+        received_at = time.time()
+        rows, bad = parse_payload(payload, self.ring.channels)
+        if bad:
+            self.ring.count_malformed(bad)
+            logger.debug(f"[{self.device}] Skipped {bad} malformed payload(s); {self.ring.malformed} so far")
+        if not len(rows):
+            return
+        if self.raw_csv_path:
+            try:
+                append_csv(self.raw_csv_path, to_records(rows))
+            except Exception as e:
+                logger.warning(f"[{self.device}] Failed to write raw CSV: {e}")
+        self.ring.write_many(rows)
+        if self.detector is None:
+            return
+        for row in rows.tolist():
+            event = self.detector.update(dict(zip(self.ring.channels, row)), received_at)
+            if event is not None and self.events is not None:
+                event["device"] = self.device
+                self.events.put(event)
+
+    def on_gap(self, duration_s: float):
+        self.ring.mark_gap()
+        if self.detector is not None:
+            self.detector.reset()
+
+
+def run_ingest(ring_names: Dict[str, str], capacity: int, events=None, raw_csv_paths: Optional[Dict[str, str]] = None):
+    """
+    Process entry point: owns one BLEHandler per device and writes decoded samples into its ring.
+    Fast-path events from the per-device MicrosleepDetector are put on `events` right away, and
+    each device's samples are recorded to its path in `raw_csv_paths`, if any.
+    """
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_ingest_main(ring_names, capacity, events, raw_csv_paths or {}))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _ingest_main(ring_names: Dict[str, str], capacity: int, events, raw_csv_paths: Dict[str, str]):
+    from ..bluetooth.ble_handler import BLEHandler
+    from ..algorithm.microsleep import MicrosleepDetector
+
+    rings = {device: SharedRingBuffer.attach(name, capacity) for device, name in ring_names.items()}
+    handlers = []
+    for device, ring in rings.items():
+        ingest = DeviceIngest(device, ring, MicrosleepDetector(), events, raw_csv_paths.get(device))
+        handler = BLEHandler(data_callback=ingest.on_payload, device_name=device, gap_callback=ingest.on_gap)
+        handlers.append((handler, ring))
+
+    tasks = [asyncio.create_task(handler.connect_and_subscribe()) for handler, _ in handlers]
+    logger.info(f"Ingest process started for {len(handlers)} device(s)")
+    try:
+        # Mirror connection state into the ring headers for the WebSocket owner
+        while True:
+            for handler, ring in handlers:
+                ring.connected = bool(handler.client and getattr(handler.client, "is_connected", False))
+            await asyncio.sleep(0.5)
+    finally:
+        for handler, ring in handlers:
+            await handler.stop()
+            ring.connected = False
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for ring in rings.values():
+            ring.close()
+
+
+# ------------------------
+# Analytics process
+# ------------------------
+def next_frame(ring: SharedRingBuffer, cursor: int, frame_size: int, write_index: int,
+               min_gap_frame: int = GAP_MIN_FRAME_ROWS) -> Tuple[int, Optional[int]]:
+    """
+    Next span of the ring to score, as (start, end), or (start, None) while the frame at
+    `start` is still filling. A span never crosses a stream gap: a partial frame closed
+    by a gap is returned on its own when it has at least `min_gap_frame` rows (as
+    DataProcessor.mark_gap does) and skipped otherwise. Gaps are re-checked for every
+    frame, since a worker that fell behind may have several queued before `write_index`.
+    """
+    while True:
+        gaps = ring.gaps_after(cursor)
+        if gaps is None:
+            logger.warning("Too many stream gaps behind the analytics cursor; skipping to the latest gap")
+            cursor = ring.gap_index
+            continue
+        gap = next((g for g in gaps if g <= write_index), None)
+        if gap is not None and gap < cursor + frame_size:
+            if gap - cursor >= min_gap_frame:
+                return cursor, gap
+            cursor = gap
+            continue
+        if write_index - cursor >= frame_size:
+            return cursor, cursor + frame_size
+        return cursor, None
+
+
+def run_analytics(ring_names: Dict[str, str], capacity: int, frame_size: int, results, poll_interval: float = 0.05):
+    """
+    Process entry point: frames each device ring as zero-copy windows, scores them and
+    puts analyze_frame results plus {"device", "connected", "timestamp"} on `results`.
+    """
+    logging.basicConfig(level=logging.INFO)
+    from ..feature_extraction.feature_vector import FeatureExtractor
+    from ..algorithm.ml_models import load_models
+    from ..algorithm.pipeline import analyze_frame
+
+    extractor = FeatureExtractor(sample_rate=SAMPLE_RATE, blink_threshold=BLINK_THRESHOLD, nod_threshold=NOD_THRESHOLD)
+    alert_model, drowsy_model = load_models()
+    rings = {device: SharedRingBuffer.attach(name, capacity) for device, name in ring_names.items()}
+
+    # Start on the frame boundary of the frame currently being filled, so a restarted
+    # worker picks up the samples already in the ring instead of waiting for a new frame
+    cursors = {device: ring.write_index - ring.write_index % frame_size for device, ring in rings.items()}
+    logger.info(f"Analytics process started for {list(rings)}")
+
+    try:
+        while True:
+            idle = True
+            for device, ring in rings.items():
+                cursor = cursors[device]
+                write_index = ring.write_index
+                if write_index - cursor > ring.capacity:
+                    logger.warning(f"[{device}] analytics fell behind the ring; skipping to the current frame")
+                    cursor = write_index - write_index % frame_size
+                while True:
+                    cursor, end = next_frame(ring, cursor, frame_size, write_index)
+                    if end is None:
+                        break
+                    frame = pd.DataFrame(ring.window(cursor, end - cursor), columns=ring.channels, copy=False)
+                    result = analyze_frame(frame, extractor, alert_model, drowsy_model)
+                    del frame
+                    if ring.is_valid(cursor):
+                        result.update({"device": device, "connected": ring.connected, "timestamp": time.time()})
+                        results.put(result)
+                    else:
+                        logger.warning(f"[{device}] frame overwritten while scoring; result dropped")
+                    cursor = end
+                    idle = False
+                cursors[device] = cursor
+            if idle:
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for ring in rings.values():
+            ring.close()
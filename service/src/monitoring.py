@@ -0,0 +1,101 @@
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+
+
+class _Window:
+    """Last `size` values in a preallocated array, so recording allocates nothing after construction."""
+    def __init__(self, size: int):
+        self._values = np.zeros(size, dtype=np.float64)
+        self.count = 0
+
+    def append(self, value: float):
+        self._values[self.count % len(self._values)] = value
+        self.count += 1
+
+    def values(self) -> np.ndarray:
+        return self._values[:min(self.count, len(self._values))]
+
+    def __len__(self) -> int:
+        return min(self.count, len(self._values))
+
+
+class GaugeSeries:
+    """
+    Bounded (time, value) series of one gauge.
+
+    Keeps running min/max/last over every value, plus at most `max_points` points that
+    cover the whole run: when the buffer fills, every other point is dropped and only
+    every second new value is kept from then on, so long runs keep an evenly thinned
+    series. Points live in preallocated arrays, so the series does not grow at all.
+    """
+    def __init__(self, max_points: int = 2048):
+        self.max_points = max(2, max_points)
+        self._t = np.zeros(self.max_points, dtype=np.float64)
+        self._v = np.zeros(self.max_points, dtype=np.float64)
+        self._n = 0
+        self.stride = 1
+        self.count = 0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.last: Optional[float] = None
+
+    def add(self, timestamp: float, value: float):
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.last = value
+        if self.count % self.stride == 0:
+            if self._n == self.max_points:
+                kept = (self._n + 1) // 2
+                self._t[:kept] = self._t[:self._n:2]
+                self._v[:kept] = self._v[:self._n:2]
+                self._n = kept
+                self.stride *= 2
+            self._t[self._n] = timestamp
+            self._v[self._n] = value
+            self._n += 1
+        self.count += 1
+
+    @property
+    def points(self) -> np.ndarray:
+        """(n, 2) array of retained (time, value) points."""
+        return np.column_stack((self._t[:self._n], self._v[:self._n]))
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        return iter(zip(self._t[:self._n].tolist(), self._v[:self._n].tolist()))
+
+    def __len__(self) -> int:
+        return self._n
+
+
+class StageStats:
+    """
+    Lightweight in-process latency and gauge recorder.
+
+    Stages (e.g. "analyze", "queue_wait") keep the last `window` durations in seconds;
+    gauges (e.g. buffer rows, connected clients) keep a bounded, downsampled (time, value)
+    series (GaugeSeries) so long runs can check that they stay flat. Both are preallocated,
+    so the recorder's own memory does not show up as growth in a soak run.
+    """
+    def __init__(self, window: int = 10000, gauge_points: int = 2048):
+        self.window = window
+        self.stages: Dict[str, _Window] = defaultdict(lambda: _Window(self.window))
+        self.gauges: Dict[str, GaugeSeries] = defaultdict(lambda: GaugeSeries(gauge_points))
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage].append(seconds)
+
+    def gauge(self, name: str, value: float, timestamp: Optional[float] = None):
+        self.gauges[name].add(timestamp if timestamp is not None else time.monotonic(), float(value))
+
+    def percentiles(self, stage: str, qs=(50, 99)) -> Dict[str, float]:
+        """Percentiles of a stage in milliseconds, e.g. {"p50": 1.2, "p99": 8.4}."""
+        samples = self.stages.get(stage)
+        if not samples:
+            return {f"p{q}": 0.0 for q in qs}
+        values = np.percentile(samples.values(), qs) * 1000
+        return {f"p{q}": float(v) for q, v in zip(qs, values)}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {stage: {**self.percentiles(stage), "samples": len(samples)} for stage, samples in self.stages.items()}
@@ -0,0 +1,228 @@
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from ..config import HISTORY_TIERS, HISTORY_MAX_RATE_HZ
+
+logger = logging.getLogger(__name__)
+
+METRIC_FIELDS = ("avg_accel", "blink_duration", "nod_freq")
+
+# Persisted int8 status codes: append new statuses, never reorder. Saved histories carry
+# this table and are remapped by name on load; files without one used the first four.
+STATUS_LEVELS = ("Unknown", "Looking good", "Be careful", "Danger", "Sensor fault")
+_LEGACY_STATUS_LEVELS = STATUS_LEVELS[:4]
+_STATUS_CODES = {name: code for code, name in enumerate(STATUS_LEVELS)}
+
+# Least to most severe, so a rollup bucket keeps the worst status it saw. A sensor fault
+# outranks "Looking good" (the driver is not known to be fine) but not a detected risk.
+STATUS_SEVERITY = ("Unknown", "Looking good", "Sensor fault", "Be careful", "Danger")
+_SEVERITY = tuple(STATUS_SEVERITY.index(name) for name in STATUS_LEVELS)
+
+
+class _Tier:
+    """Fixed-size ring of (timestamp, metrics, worst status) points at one resolution."""
+    def __init__(self, resolution: float, retention: float):
+        self.resolution = resolution
+        self.retention = retention
+        rate = HISTORY_MAX_RATE_HZ if resolution == 0 else 1.0 / resolution
+        self.capacity = max(1, int(np.ceil(retention * rate)))
+        self.t = np.zeros(self.capacity, dtype=np.float64)
+        self.values = np.zeros((self.capacity, len(METRIC_FIELDS)), dtype=np.float64)
+        self.status = np.zeros(self.capacity, dtype=np.int8)
+        self.written = 0  # total points ever appended
+
+        # Open rollup bucket (unused for the raw tier)
+        self._bucket: Optional[float] = None
+        self._sum = np.zeros(len(METRIC_FIELDS), dtype=np.float64)
+        self._count = 0
+        self._worst = 0
+
+    def _append(self, t: float, values: np.ndarray, status: int):
+        i = self.written % self.capacity
+        self.t[i] = t
+        self.values[i] = values
+        self.status[i] = status
+        self.written += 1
+
+    def add(self, t: float, values: np.ndarray, status: int):
+        if self.resolution == 0:
+            self._append(t, values, status)
+            return
+        bucket = t - t % self.resolution
+        if self._bucket is not None and bucket != self._bucket:
+            self._flush()
+        self._bucket = bucket
+        self._sum += values
+        self._count += 1
+        if _SEVERITY[status] > _SEVERITY[self._worst]:
+            self._worst = status
+
+    def _flush(self):
+        if self._count:
+            self._append(self._bucket, self._sum / self._count, self._worst)
+        self._sum[:] = 0.0
+        self._count = 0
+        self._worst = 0
+
+    def _segments(self) -> Sequence[slice]:
+        """Physical slices of the ring in chronological order."""
+        if self.written <= self.capacity:
+            return (slice(0, self.written),)
+        head = self.written % self.capacity
+        return (slice(head, self.capacity), slice(0, head))
+
+    def _slices(self, start: float, end: float) -> Sequence[slice]:
+        parts = []
+        for seg in self._segments():
+            ts = self.t[seg]
+            lo = seg.start + int(np.searchsorted(ts, start, side="left"))
+            hi = seg.start + int(np.searchsorted(ts, end, side="right"))
+            if hi > lo:
+                parts.append(slice(lo, hi))
+        return parts
+
+    def count(self, start: float, end: float) -> int:
+        """Number of closed points in [start, end], without materializing them."""
+        return sum(p.stop - p.start for p in self._slices(start, end))
+
+    def range(self, start: float, end: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Points with start <= t <= end, found by binary search (O(log n + k))."""
+        parts = self._slices(start, end)
+        t = [self.t[p] for p in parts]
+        values = [self.values[p] for p in parts]
+        status = [self.status[p] for p in parts]
+
+        # Include the still-open bucket so the newest rollup point is never missing
+        if self._count and start <= self._bucket <= end:
+            t.append(np.array([self._bucket]))
+            values.append((self._sum / self._count)[None, :])
+            status.append(np.array([self._worst], dtype=np.int8))
+        if not t:
+            return np.empty(0), np.empty((0, len(METRIC_FIELDS))), np.empty(0, dtype=np.int8)
+        return np.concatenate(t), np.concatenate(values), np.concatenate(status)
+
+    def oldest(self) -> Optional[float]:
+        if not self.written:
+            return None
+        return float(self.t[self._segments()[0].start])
+
+    def newest(self) -> Optional[float]:
+        if self._count:
+            return self._bucket
+        if not self.written:
+            return None
+        return float(self.t[(self.written - 1) % self.capacity])
+
+
+class StateHistory:
+    """
+    In-memory time series of dashboard states with fixed-size multi-resolution rollups.
+
+    Every recorded state goes into the raw tier and is folded into each rollup tier's
+    open bucket (metric means, worst status). Memory is bounded by the tier sizes in
+    `HISTORY_TIERS`, and a query reads only the points it returns from the finest tier
+    that still covers the requested range, so late-joining dashboards never scan raw samples.
+
+    Tiers are binary-searched, so timestamps must not go backwards: a state that arrives
+    late (e.g. from another analytics worker) is recorded at the newest timestamp so far.
+    """
+    def __init__(self, tiers: Sequence[Tuple[float, float]] = HISTORY_TIERS, path: Optional[str] = None):
+        self.tiers = [_Tier(resolution, retention) for resolution, retention in sorted(tiers)]
+        self.path = Path(path) if path else None
+        self._latest = -np.inf
+        if self.path and self.path.exists():
+            self.load(self.path)
+
+    def record(self, timestamp: float, status: str, metrics: Dict[str, float]):
+        if timestamp < self._latest:
+            logger.debug(f"State {self._latest - timestamp:.3f} s out of order; recorded at the latest timestamp")
+            timestamp = self._latest
+        self._latest = timestamp
+        values = np.array([float(metrics.get(f, 0.0)) for f in METRIC_FIELDS])
+        code = _STATUS_CODES.get(status, 0)
+        for tier in self.tiers:
+            tier.add(timestamp, values, code)
+
+    def _pick_tier(self, start: float, end: float, max_points: Optional[int]) -> _Tier:
+        for tier in self.tiers:
+            # A tier that has not wrapped yet still holds everything recorded so far
+            covers = tier.written <= tier.capacity or tier.oldest() <= start
+            if covers and (max_points is None or tier.count(start, end) <= max_points):
+                return tier
+        return self.tiers[-1]
+
+    def query(self, start: float, end: float, max_points: Optional[int] = None) -> Dict:
+        """Columnar history between `start` and `end` (epoch seconds) at the finest suitable resolution."""
+        tier = self._pick_tier(start, end, max_points)
+        t, values, status = tier.range(start, end)
+        if max_points is not None and len(t) > max_points:
+            t, values, status = t[-max_points:], values[-max_points:], status[-max_points:]
+        result = {
+            "type": "history",
+            "resolution": tier.resolution,
+            "t": t.tolist(),
+            "status": [STATUS_LEVELS[c] for c in status],
+        }
+        for i, field in enumerate(METRIC_FIELDS):
+            result[field] = values[:, i].tolist()
+        return result
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Copy of all tier points and open rollup buckets; cheap enough to take on the event loop."""
+        arrays = {"status_levels": np.array(STATUS_LEVELS)}
+        for i, tier in enumerate(self.tiers):
+            arrays.update({
+                f"tier{i}": np.array([tier.resolution, tier.retention, tier.written]),
+                f"t{i}": tier.t.copy(), f"v{i}": tier.values.copy(), f"s{i}": tier.status.copy(),
+                f"open{i}": np.array([np.nan if tier._bucket is None else tier._bucket, tier._count, tier._worst]),
+                f"sum{i}": tier._sum.copy(),
+            })
+        return arrays
+
+    def write(self, arrays: Dict[str, np.ndarray], path: Optional[str] = None):
+        """Write a `snapshot()` atomically (temp file, then rename); safe to run in an executor."""
+        target = Path(path) if path else self.path
+        if target is None:
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, target)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def save(self, path: Optional[str] = None):
+        self.write(self.snapshot(), path)
+
+    def load(self, path: str):
+        """Restore tiers saved by `save()`; tiers whose layout changed since are skipped."""
+        try:
+            with np.load(path) as data:
+                saved = data["status_levels"].tolist() if "status_levels" in data else _LEGACY_STATUS_LEVELS
+                remap = np.array([_STATUS_CODES.get(name, 0) for name in saved], dtype=np.int8)
+                for i, tier in enumerate(self.tiers):
+                    if f"tier{i}" not in data:
+                        continue
+                    resolution, retention, written = data[f"tier{i}"]
+                    if (resolution, retention) != (tier.resolution, tier.retention) or len(data[f"t{i}"]) != tier.capacity:
+                        logger.warning(f"History tier {i} layout changed; not restored")
+                        continue
+                    tier.t[:] = data[f"t{i}"]
+                    tier.values[:] = data[f"v{i}"]
+                    tier.status[:] = remap[data[f"s{i}"]]
+                    tier.written = int(written)
+                    if f"open{i}" in data:
+                        bucket, count, worst = data[f"open{i}"]
+                        tier._bucket = None if np.isnan(bucket) else float(bucket)
+                        tier._count, tier._worst = int(count), int(remap[int(worst)])
+                        tier._sum[:] = data[f"sum{i}"]
+            self._latest = max((t for t in (tier.newest() for tier in self.tiers) if t is not None), default=-np.inf)
+            logger.info(f"State history restored from {path}")
+        except Exception as e:
+            logger.warning(f"Failed to load state history from {path}: {e}")
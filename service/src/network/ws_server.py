@@ -1,13 +1,15 @@
 import asyncio
 import json
+import time
 import websockets
 
 class WebSocketServer:
     """Broadcasts real-time state updates from the backend to connected dashboards."""
-    def __init__(self, host="localhost", port=8765):
+    def __init__(self, host="localhost", port=8765, history=None):
         self.host = host
         self.port = port
         self.clients = set()
+        self.history = history  # optional StateHistory, or {device: StateHistory}, answering history requests
 
     async def handler(self, websocket):
         """Handles new dashboard connections."""
@@ -15,14 +17,49 @@ class WebSocketServer:
         print(f"[WS] Dashboard connected ({len(self.clients)} client(s))")
         try:
             async for message in websocket:
-                # Optionally handle incoming dashboard messages here
-                print(f"[WS] Received from dashboard: {message}")
+                reply = self.handle_request(message)
+                if reply is not None:
+                    await websocket.send(json.dumps(reply))
+                else:
+                    print(f"[WS] Received from dashboard: {message}")
         except Exception as e:
             print(f"[WS] Client error: {e}")
         finally:
             self.clients.remove(websocket)
             print(f"[WS] Dashboard disconnected ({len(self.clients)} remaining)")
 
+    def handle_request(self, message):
+        """
+        Answer dashboard requests. Currently supports history queries:
+        {"type": "history", "start": <epoch s>, "end": <epoch s>, "max_points": <int>, "device": <name>}
+        (start defaults to one hour before end, end defaults to now, device to the first one
+        when histories are kept per device).
+        Returns the reply dict, or None if the message is not a request we understand.
+        """
+        try:
+            request = json.loads(message)
+        except (json.JSONDecodeError, TypeError):
+            return None
+        if not isinstance(request, dict) or request.get("type") != "history" or self.history is None:
+            return None
+        history = self.history
+        if isinstance(history, dict):
+            device = request.get("device", next(iter(history), None))
+            if not isinstance(device, str) or device not in history:
+                return {"type": "error", "error": f"Unknown device: {device}"}
+            history = history[device]
+        try:
+            end = float(request.get("end", time.time()))
+            start = float(request.get("start", end - 3600))
+            max_points = request.get("max_points")
+            if max_points is not None:
+                max_points = int(max_points)
+                if max_points < 1:
+                    raise ValueError(f"max_points must be at least 1, got {max_points}")
+            return history.query(start, end, max_points)
+        except (TypeError, ValueError) as e:
+            return {"type": "error", "error": f"Invalid history request: {e}"}
+
     async def broadcast(self, state: dict):
         """Send current state to all connected dashboards."""
         if not self.clients:
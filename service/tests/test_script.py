@@ -1,12 +1,33 @@
 import asyncio
+import json
+import queue
+import tempfile
+from pathlib import Path
 import pandas as pd
 import numpy as np
 import pytest
 from src.data_cleansing.data_processor import DataProcessor
+from src.data_cleansing.parser import parse_lines, parse_payload
+from src.data_cleansing.signal_quality import quality_metrics, failed_checks, LIMITS, check_frame
+from src.data_cleansing.schema import FRAME_DTYPE, to_records
+from src.feature_extraction.sweep import load_recording
+from src.algorithm.pipeline import analyze_frame
 from src.feature_extraction.feature_vector import FeatureExtractor
+from src.feature_extraction.sweep import blink_durations_ms, nod_frequencies_hz, drowsy_rates, sweep_recording
 from src.algorithm.baseline import define_and_save_drowsiness_baseline, load_baseline
 from src.algorithm.ml_models import load_models, predict_state
-from src.config import FRAME_SIZE, SAMPLE_RATE, BLINK_THRESHOLD, NOD_THRESHOLD
+from src.algorithm.microsleep import MicrosleepDetector
+from src.config import FRAME_SIZE, SAMPLE_RATE, BLINK_THRESHOLD, NOD_THRESHOLD, SENSOR_CHANNELS, IR_MISSING
+from src.ipc import SharedRingBuffer
+from src.ipc.workers import next_frame, DeviceIngest
+from src.bluetooth import ble_handler
+from src.checkpoint import CheckpointManager
+from src.controller import restore_checkpoint, new_device_state, update_device_state, mirror_device, device_path
+from src.cadence import AdaptiveCadence
+from src.monitoring import StageStats
+from scripts.soak import slope_per_hour, check_budgets, parse_args
+from src.network.history import StateHistory
+from src.network.ws_server import WebSocketServer
 
 # Mark async tests individually to avoid marking sync tests as asyncio coroutines
 # ------------------------
@@ -32,6 +53,17 @@ async def test_data_processor():
     assert isinstance(frame, pd.DataFrame), "Queued frame should be DataFrame"
     assert len(frame) == FRAME_SIZE, f"Frame should have {FRAME_SIZE} rows, got {len(frame)}"
     assert len(processor.buffer) == 0, f"Buffer should be empty after queuing, got {len(processor.buffer)}"
+
+    # A gap closes the partial frame: scored if long enough, dropped otherwise
+    for _ in range(processor.min_gap_frame):
+        processor.process_data({"photodiode_value": 1000, "ay": 0.05, "gz": 0.0})
+    processor.mark_gap(0.5)
+    partial = await queue.get()
+    assert len(partial) == processor.min_gap_frame and len(processor.buffer) == 0
+    processor.process_data({"photodiode_value": 1000, "ay": 0.05, "gz": 0.0})
+    processor.mark_gap(0.5)
+    await asyncio.sleep(0)
+    assert queue.empty() and len(processor.buffer) == 0, "A too-short partial frame should be dropped"
     print("DataProcessor test passed.")
 
 # ------------------------
@@ -143,6 +175,547 @@ async def test_integration():
     
     print("Integration test passed.")
 
+# ------------------------
+# Test shared-memory ring transport
+# ------------------------
+def test_shared_ring_buffer():
+    print("Testing SharedRingBuffer...")
+    ring = SharedRingBuffer.create(capacity=10)
+    reader = SharedRingBuffer.attach(ring.name, capacity=10)
+    try:
+        for i in range(8):
+            ring.write([i] * len(SENSOR_CHANNELS))
+        assert reader.write_index == 8
+
+        # Contiguous windows are zero-copy views onto shared memory, one per channel in its schema dtype
+        view = reader.window(0, 5)
+        assert np.shares_memory(view["ax"], reader.window(2, 3)["ax"])
+        assert view["ax"].tolist() == [0, 1, 2, 3, 4]
+        assert view["ax"].dtype == np.float32 and view["ir"].dtype == np.int16
+
+        # Wrapping windows are returned as a copy in logical order
+        ring.write_many(np.arange(8, 13)[:, None].repeat(len(SENSOR_CHANNELS), axis=1))
+        assert reader.window(5, 8)["ax"].tolist() == list(range(5, 13))
+        assert not reader.is_valid(0), "Lapped samples should be reported invalid"
+        assert reader.is_valid(3)
+        ring.mark_gap()
+        assert reader.gap_index == 13
+
+        # Gaps queue up, and framing never spans one even when the reader is several frames behind
+        ring.write_many(np.full((3, len(SENSOR_CHANNELS)), 1.0))
+        ring.mark_gap()
+        ring.write_many(np.full((5, len(SENSOR_CHANNELS)), 2.0))
+        assert reader.gaps_after(10) == [13, 16] and reader.gaps_after(13) == [16]
+        assert next_frame(reader, 11, 2, reader.write_index, min_gap_frame=2) == (11, 13), "Frame ends at the gap"
+        assert next_frame(reader, 12, 2, reader.write_index, min_gap_frame=2) == (13, 15)
+        # A partial frame closed by a gap is scored on its own if long enough, else skipped
+        assert next_frame(reader, 13, 4, reader.write_index, min_gap_frame=3) == (13, 16)
+        assert next_frame(reader, 13, 4, reader.write_index, min_gap_frame=4) == (16, 20)
+        assert next_frame(reader, 16, 8, reader.write_index) == (16, None), "Frame still filling"
+        for _ in range(16):
+            ring.write([3.0] * len(SENSOR_CHANNELS))
+            ring.mark_gap()
+        assert reader.gaps_after(10) is None, "Overwritten gap slots must not pass as gap-free"
+        assert next_frame(reader, 10, 2, reader.write_index)[0] == reader.gap_index
+
+        rows, bad = parse_payload({"ax": 1, "ay": 2, "az": 3, "gx": 4, "gy": 5, "gz": 6, "ir": 7})
+        assert rows.tolist() == [[1, 2, 3, 4, 5, 6, 7]] and bad == 0
+        assert parse_payload("0.982,0.012,0.215,0.9,-0.01,0.3,4095")[0][0, -1] == 4095
+        rows, bad = parse_payload("garbage")
+        assert len(rows) == 0 and bad == 1
+        del view
+    finally:
+        reader.close()
+        ring.close()
+        ring.unlink()
+    print("SharedRingBuffer test passed.")
+
+# ------------------------
+# Test multi-process ingest path
+# ------------------------
+def test_device_ingest(tmp_path):
+    print("Testing DeviceIngest...")
+    ring = SharedRingBuffer.create(capacity=100)
+    events = queue.Queue()
+    ingest = DeviceIngest("Glasses-A", ring, MicrosleepDetector(sample_rate=10, closure_ms=1000), events,
+                          raw_csv_path=str(tmp_path / "raw" / "live_payloads.csv"))
+    try:
+        closed = {"ax": 0.98, "ay": 0.01, "az": 0.2, "gx": 0.0, "gy": 0.0, "gz": 0.0, "ir": 100}
+        ingest.on_payload([closed] * 6 + ["bad"])
+        ingest.on_payload("\n".join(["0.98,0.01,0.2,0,0,0,100"] * 6 + ["a,b,c"]))
+        assert ring.write_index == 12 and ring.malformed == 2
+        assert events.get_nowait()["device"] == "Glasses-A"
+
+        # Recorded like DataProcessor's raw CSV, so the calibration sweep can read it
+        recording = load_recording(str(tmp_path / "raw" / "live_payloads.csv"))
+        assert len(recording) == 12 and recording["ir"].dtype == np.int16 and (recording["ir"] == 100).all()
+
+        ingest.on_gap(1.0)
+        assert ring.gap_index == 12 and ingest.detector._closed_run == 0
+    finally:
+        ring.close()
+        ring.unlink()
+    print("DeviceIngest test passed.")
+
+# ------------------------
+# Test dashboard state history
+# ------------------------
+def test_state_history(tmp_path):
+    print("Testing StateHistory...")
+    history = StateHistory(tiers=((0, 60), (10, 3600)), path=str(tmp_path / "history.npz"))
+    t0 = 1_000_000.0
+    for i in range(1200):  # 20 min of 1 Hz states; the raw tier only has room for the last 10
+        status = "Danger" if i == 105 else "Looking good"
+        history.record(t0 + i, status, {"avg_accel": 0.1, "blink_duration": float(i), "nod_freq": 0.0})
+
+    recent = history.query(t0 + 1190, t0 + 1199)
+    assert recent["resolution"] == 0 and len(recent["t"]) == 10
+    assert recent["blink_duration"] == [float(i) for i in range(1190, 1200)]
+
+    # Older than the raw tier: answered from 10 s rollups, keeping the worst status per bucket
+    full = history.query(t0, t0 + 1199)
+    assert full["resolution"] == 10 and len(full["t"]) == 120
+    assert full["status"][10] == "Danger" and full["status"][11] == "Looking good"
+    assert full["blink_duration"][0] == 4.5
+
+    # max_points also pushes the query to a coarser tier
+    assert history.query(t0 + 1150, t0 + 1199, max_points=10)["resolution"] == 10
+
+    history.save()
+    restored = StateHistory(tiers=((0, 60), (10, 3600)), path=str(tmp_path / "history.npz"))
+    assert restored.query(t0, t0 + 1189)["t"] == history.query(t0, t0 + 1189)["t"]
+    assert restored.query(t0, t0 + 1189)["status"] == history.query(t0, t0 + 1189)["status"]
+
+    # The open 10 s bucket (t0 + 1190..1199) survives a save/load instead of being lost
+    open_bucket = restored.query(t0 + 1190, t0 + 1199, max_points=1)
+    assert open_bucket == history.query(t0 + 1190, t0 + 1199, max_points=1) and open_bucket["blink_duration"] == [1194.5]
+    assert restored.tiers[1].count(t0, t0 + 1199) == 119 and restored.tiers[1].newest() == t0 + 1190
+
+    # Late states from another worker are recorded at the latest timestamp, keeping tiers sorted
+    late = StateHistory(tiers=((0, 60), (10, 3600)))
+    for t in (t0 + 5, t0 + 3, t0 + 25, t0 + 12):
+        late.record(t, "Danger" if t == t0 + 3 else "Looking good", {"blink_duration": t - t0})
+    raw = late.query(t0, t0 + 60)
+    assert raw["t"] == [t0 + 5, t0 + 5, t0 + 25, t0 + 25] and raw["status"][1] == "Danger"
+    assert late.tiers[1].count(t0, t0 + 60) == 1 and late.query(t0, t0 + 60, max_points=2)["t"] == [t0, t0 + 20]
+
+    # A sensor fault is not hidden behind "Looking good" in a rollup, but a detected risk outranks it
+    faults = StateHistory(tiers=((10, 3600),))
+    for i, status in enumerate(["Looking good", "Sensor fault", "Looking good", "Sensor fault", "Be careful"]):
+        faults.record(t0 + 10 * (i // 3) + i % 3, status, {})
+    assert faults.query(t0, t0 + 19)["status"] == ["Sensor fault", "Be careful"]
+
+    # Status codes are remapped by name on load; files without a table use the legacy codes
+    arrays = restored.snapshot()
+    arrays["status_levels"] = np.array(["Unknown", "Danger", "Be careful", "Looking good"])
+    restored.write(arrays, str(tmp_path / "reordered.npz"))
+    swapped = StateHistory(tiers=((0, 60), (10, 3600)), path=str(tmp_path / "reordered.npz"))
+    assert swapped.query(t0, t0 + 1199)["status"][10:12] == ["Looking good", "Danger"]
+    del arrays["status_levels"]
+    restored.write(arrays, str(tmp_path / "legacy.npz"))
+    legacy = StateHistory(tiers=((0, 60), (10, 3600)), path=str(tmp_path / "legacy.npz"))
+    assert legacy.query(t0, t0 + 1189)["status"] == history.query(t0, t0 + 1189)["status"]
+
+    server = WebSocketServer(history=history)
+    reply = server.handle_request(json.dumps({"type": "history", "start": t0 + 1190, "end": t0 + 1199}))
+    assert reply["type"] == "history" and len(reply["t"]) == 10
+    assert server.handle_request("hello") is None
+    for bad in (0, -3):
+        assert server.handle_request(json.dumps({"type": "history", "max_points": bad}))["type"] == "error"
+    print("StateHistory test passed.")
+
+# ------------------------
+# Test fast-path microsleep detection
+# ------------------------
+def test_microsleep_detector():
+    print("Testing MicrosleepDetector...")
+    events = []
+    processor = DataProcessor(asyncio.Queue(), detector=MicrosleepDetector(sample_rate=10, closure_ms=1000),
+                              event_callback=events.append)
+
+    # Eyes open, then a 3 s closure: exactly one alert, raised on the 10th closed sample
+    for _ in range(20):
+        processor.process_data({"photodiode_value": 950, "ay": 0.0, "gz": 0.0})
+    for i in range(30):
+        processor.process_data({"photodiode_value": 100, "ay": 0.0, "gz": 0.0})
+        if i == 8:
+            assert not events, "Closure shorter than the limit must not alert"
+    assert [e["event"] for e in events] == ["eye_closure"]
+    assert events[0]["duration_ms"] == 1000 and events[0]["type"] == "event"
+
+    # Sharp head drop on the gyro, then the cooldown suppresses repeats
+    processor.process_data({"photodiode_value": 950, "ay": 0.0, "gz": 120.0})
+    processor.process_data({"photodiode_value": 950, "ay": 0.0, "gz": 120.0})
+    assert [e["event"] for e in events] == ["eye_closure", "head_drop"]
+    assert len(processor.buffer) == 52, "Fast path must not consume samples from the frame buffer"
+    print("MicrosleepDetector test passed.")
+
+# ------------------------
+# Test BLE fast reconnect and gap marking
+# ------------------------
+class FakeBleakClient:
+    def __init__(self, address, services=None, timeout=None):
+        self.address = address
+        self.is_connected = False
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def disconnect(self):
+        self.is_connected = False
+
+@pytest.mark.asyncio
+async def test_ble_fast_reconnect(monkeypatch):
+    print("Testing BLE fast reconnect...")
+    monkeypatch.setattr(ble_handler, "BleakClient", FakeBleakClient)
+    processor = DataProcessor(asyncio.Queue(), detector=MicrosleepDetector())
+    handler = ble_handler.BLEHandler(data_callback=processor.process_data, gap_callback=processor.mark_gap)
+
+    # No cached address yet: the fast path must defer to scanning
+    assert await handler._fast_reconnect() is None
+
+    for _ in range(5):
+        processor.process_data({"photodiode_value": 100, "ay": 0.0, "gz": 0.0})
+    handler._last_address = "AA:BB:CC:DD:EE:FF"
+    handler._rx_buffer = '{"ax": 0.9'  # half a payload from before the dropout
+    handler._mark_disconnected()
+
+    assert await handler._fast_reconnect() == "AA:BB:CC:DD:EE:FF"
+    assert handler.client.is_connected
+    handler._mark_reconnected()
+
+    assert len(handler.reconnect_latencies) == 1
+    assert handler._rx_buffer == ""
+    assert len(processor.buffer) == 0 and processor.gap_count == 1, "Pre-gap rows must not be stitched into the next frame"
+    assert processor.detector._closed_run == 0
+
+    # The slow-path scan only picks this handler's peripheral, by name or address
+    class Found:
+        def __init__(self, name, address):
+            self.name, self.address = name, address
+            self.local_name, self.service_uuids = name, [ble_handler.SERVICE_UUID]
+
+    peripherals = [Found("Glasses-A", "11:11:11:11:11:11"), Found("Glasses-B", "22:22:22:22:22:22")]
+
+    async def find_device_by_filter(match, timeout=None):
+        return next((p for p in peripherals if match(p, p)), None)
+
+    monkeypatch.setattr(ble_handler.BleakScanner, "find_device_by_filter", find_device_by_filter)
+    for wanted, address in [("Glasses-B", "22:22:22:22:22:22"), ("11:11:11:11:11:11", "11:11:11:11:11:11")]:
+        scanner = ble_handler.BLEHandler(data_callback=print, device_name=wanted)
+        assert await scanner._scan_and_connect(backoff=0) == address
+    print("BLE fast reconnect test passed.")
+
+# ------------------------
+# Test vectorized calibration sweep
+# ------------------------
+def test_threshold_sweep(tmp_path):
+    print("Testing threshold sweep...")
+    rng = np.random.default_rng(1)
+    n = 3 * FRAME_SIZE
+    ir = rng.integers(900, 1100, n).astype(float)
+    ir[rng.random(n) < 0.05] = rng.integers(50, 400)
+    gz = np.sin(np.arange(n) / 3.0) * rng.random(n) * 2
+    ay = rng.random(n) * 0.5
+    blink_thresholds = np.array([100.0, 250.0, 500.0])
+    nod_thresholds = np.array([0.2, 0.5, 1.5])
+
+    windows = lambda x: x.reshape(3, FRAME_SIZE)
+    blink = blink_durations_ms(windows(ir), blink_thresholds, SAMPLE_RATE)
+    nod = nod_frequencies_hz(windows(gz), nod_thresholds, SAMPLE_RATE)
+
+    # Every grid cell must match what FeatureExtractor computes for that setting
+    for i, (bt, nt) in enumerate(zip(blink_thresholds, nod_thresholds)):
+        extractor = FeatureExtractor(sample_rate=SAMPLE_RATE, blink_threshold=bt, nod_threshold=nt)
+        for j in range(3):
+            frame = pd.DataFrame({"photodiode_value": windows(ir)[j], "ay": windows(ay)[j], "gz": windows(gz)[j]})
+            assert blink[i, j] == pytest.approx(extractor.getBlinkScalar(frame))
+            assert nod[i, j] == pytest.approx(extractor.getNodFreqScalar(frame))
+
+    # Vectorized HMM decision matches predict_state
+    alert_model, drowsy_model = load_models()
+    accel = windows(ay).mean(axis=1)
+    rates = drowsy_rates(blink, nod, accel, alert_model, drowsy_model)
+    expected = np.mean([
+        predict_state([blink[0, j], nod[1, j], accel[j]], alert_model, drowsy_model) == "Drowsy" for j in range(3)
+    ])
+    assert rates[0, 1] == pytest.approx(expected)
+
+    # Recordings written by DataProcessor (with a header row) load and sweep
+    recording = tmp_path / "recording.csv"
+    processor = DataProcessor(asyncio.Queue(), raw_csv_path=str(recording))
+    for i in range(200):
+        processor.process_data({"ax": 0.98, "ay": ay[i], "az": 0.2, "gx": 0.0, "gy": 0.0, "gz": gz[i], "ir": ir[i]})
+    assert recording.read_text().startswith("ax,ay,az,gx,gy,gz,photodiode_value")
+    df = load_recording(str(recording))
+    assert len(df) == 200 and "ir" in df.columns
+    swept = sweep_recording(str(recording), blink_thresholds, nod_thresholds, [50], SAMPLE_RATE)
+    assert swept[50]["blink"].shape == (3, 4) and swept[50]["accel"].shape == (4,)
+    print("Threshold sweep test passed.")
+
+# ------------------------
+# Test warm-restart checkpointing
+# ------------------------
+@pytest.mark.asyncio
+async def test_checkpoint_restore(tmp_path):
+    print("Testing checkpoint restore...")
+    processor = DataProcessor(asyncio.Queue(), detector=MicrosleepDetector())
+    for _ in range(FRAME_SIZE // 2):
+        processor.process_data({"photodiode_value": 100, "ay": 0.1, "gz": 0.0})
+    state = {"connected": True, "duration": 42.0, "status": "Danger", "metrics": {"blink_duration": np.float64(900.0)}}
+
+    checkpoint = CheckpointManager(str(tmp_path / "checkpoint.npz"))
+    checkpoint.write({"processor": processor.snapshot(), "state": dict(state)})
+
+    # A restarted processor gets the half-filled frame back as typed records
+    restored = DataProcessor(asyncio.Queue(), detector=MicrosleepDetector())
+    components = checkpoint.load()
+    restored.restore(components["processor"])
+    assert restored.buffer.dtype == processor.buffer.dtype
+    assert restored.buffer.tobytes() == processor.buffer.tobytes()
+    assert components["state"]["status"] == "Danger" and components["state"]["metrics"]["blink_duration"] == 900.0
+
+    # restore_checkpoint continues the frame across the restart and records the gap in it
+    queue = asyncio.Queue()
+    restarted = DataProcessor(queue, detector=MicrosleepDetector())
+    restarted_state = {"duration": 0.0, **new_device_state()}
+    restore_checkpoint(checkpoint, restarted_state, restarted)
+    assert len(restarted.buffer) == FRAME_SIZE // 2 and restarted.gap_count == 1 and queue.empty()
+    assert restarted.detector._closed_run == 0, "A closure run must not span the restart"
+    assert restarted_state["status"] == "Danger" and restarted_state["connected"] is False
+    for _ in range(FRAME_SIZE - FRAME_SIZE // 2):
+        restarted.process_data({"photodiode_value": 950, "ay": 0.1, "gz": 0.0})
+    frame = await queue.get()
+    assert len(frame) == FRAME_SIZE and frame["photodiode_value"].iloc[0] == 100
+    (gap_row, gap_s), = frame.attrs["gaps"]
+    assert gap_row == FRAME_SIZE // 2 and 0 <= gap_s < checkpoint.max_age_s
+
+    # Checkpoints never unpickle: object arrays are refused on write
+    with pytest.raises(TypeError):
+        checkpoint.write({"state": {"bad": np.array([{"x": 1}], dtype=object)}})
+
+    # Stale snapshots are ignored
+    assert CheckpointManager(str(tmp_path / "checkpoint.npz"), max_age_s=-1).load() is None
+    assert CheckpointManager(str(tmp_path / "missing.npz")).load() is None
+    print("Checkpoint restore test passed.")
+
+# ------------------------
+# Test per-device dashboard state
+# ------------------------
+def test_device_state(tmp_path):
+    print("Testing per-device state...")
+    state = {"connected": False, "duration": 0.0, "devices": {d: new_device_state() for d in ("Glasses-A", "Glasses-B")}}
+    result = {"status": "Danger", "metrics": {"avg_accel": 0.1, "blink_duration": 900.0, "nod_freq": 0.2}, "faults": []}
+    update_device_state(state, {**result, "device": "Glasses-A"})
+    update_device_state(state, {"status": "Sensor fault", "metrics": None, "faults": ["saturation"], "device": "Glasses-B"})
+    update_device_state(state, {"type": "event", "event": "eye_closure", "device": "Glasses-B"})
+    a, b = state["devices"]["Glasses-A"], state["devices"]["Glasses-B"]
+    assert a["status"] == "Danger" and a["metrics"]["blink_duration"] == 900.0 and a["last_event"] is None
+    assert b["status"] == "Sensor fault" and b["metrics"]["blink_duration"] == 0.0 and b["last_event"]["event"] == "eye_closure"
+
+    # The top level mirrors one device, keeping the single-device dashboard fields
+    mirror_device(state, "Glasses-A")
+    assert state["status"] == "Danger" and state["metrics"] is a["metrics"] and state["sensor_faults"] == []
+    assert state["connected"] is False and "last_event" in state
+
+    # A flat single-device checkpoint does not leak top-level fields into the per-device layout
+    checkpoint = CheckpointManager(str(tmp_path / "checkpoint.npz"))
+    checkpoint.write({"state": {"duration": 12.0, "status": "Danger", "devices": {"Glasses-A": a}}})
+    restored = {"connected": False, "duration": 0.0, "devices": {}}
+    restore_checkpoint(checkpoint, restored)
+    assert "status" not in restored and restored["devices"]["Glasses-A"]["status"] == "Danger"
+
+    # History requests pick the device's own series
+    assert device_path("data/state_history.npz", "AA:BB") == str(Path("data/state_history_AA_BB.npz"))
+    histories = {"Glasses-A": StateHistory(tiers=((0, 60),)), "Glasses-B": StateHistory(tiers=((0, 60),))}
+    histories["Glasses-B"].record(1000.0, "Danger", {})
+    server = WebSocketServer(history=histories)
+    assert server.handle_request(json.dumps({"type": "history", "start": 0, "end": 2000}))["t"] == []
+    reply = server.handle_request(json.dumps({"type": "history", "start": 0, "end": 2000, "device": "Glasses-B"}))
+    assert reply["status"] == ["Danger"]
+    assert server.handle_request(json.dumps({"type": "history", "device": "Glasses-C"}))["type"] == "error"
+    print("Per-device state test passed.")
+
+# ------------------------
+# Test schema-aware text parser
+# ------------------------
+def test_text_parser():
+    print("Testing text parser...")
+    csv_lines = ["0.982,0.012,0.215,0.9,-0.01,0.3,4095", "0.982,0.011,0.215,0.92,0.01,0.33,120"]
+    rows, bad = parse_lines(csv_lines)
+    assert bad == 0 and rows.shape == (2, len(SENSOR_CHANNELS))
+    assert rows[:, SENSOR_CHANNELS.index("ir")].tolist() == [4095, 120]
+
+    # Mixed JSON / CSV batches fall back to per-line parsing; malformed lines are counted and skipped
+    mixed = csv_lines + ['{"ax":1,"ay":2,"az":3,"gx":4,"gy":5,"gz":6,"ir":7}', "1,2,3", "a,b,c,d,e,f,g", "{broken"]
+    rows, bad = parse_lines(mixed)
+    assert bad == 3 and rows.shape == (3, len(SENSOR_CHANNELS))
+    assert rows[2].tolist() == [1, 2, 3, 4, 5, 6, 7]
+
+    # CSV payloads reach the frame with named columns instead of 0..6
+    processor = DataProcessor(asyncio.Queue())
+    processor.process_data("\n".join(mixed))
+    assert processor.malformed_lines == 3 and len(processor.buffer) == 3
+
+    # BLEHandler hands a JSON array over already parsed: each object is a sample, bad ones are counted
+    batch = [{"ax": 1, "ay": 2, "az": 3, "gx": 4, "gy": 5, "gz": 6, "ir": 7}, {"ir": "x"}, "nope", {"ir": 900}]
+    processor.process_data(batch)
+    assert processor.malformed_lines == 5 and len(processor.buffer) == 5
+    assert processor.buffer[-1]["photodiode_value"] == 900
+    assert processor.buffer[0]["photodiode_value"] == 4095 and processor.buffer[0]["gz"] == np.float32(0.3)
+    print("Text parser test passed.")
+
+# ------------------------
+# Test adaptive processing cadence
+# ------------------------
+def test_adaptive_cadence():
+    print("Testing adaptive cadence...")
+    cadence = AdaptiveCadence(confident_margin=10, stable_frames=2, max_latency_s=400, max_broadcast_s=4,
+                              frame_period_s=100, base_broadcast_s=1)
+    confident = {"prediction": "Alert", "margin": 50.0}
+    assert cadence.should_score() and cadence.stride == 1
+
+    # Sustained confident-alert frames double the stride and interval up to their bounds
+    for _ in range(10):
+        cadence.observe(confident, cpu_s=0.01)
+    assert cadence.stride == 4 and cadence.broadcast_interval == 4
+    scored = [cadence.should_score() for _ in range(8)]
+    assert scored.count(True) == 2 and cadence.frames_skipped == 6
+
+    # A shrinking margin or a fast-path event restores full rate immediately
+    cadence.observe({"prediction": "Alert", "margin": 2.0})
+    assert cadence.stride == 1 and cadence.broadcast_interval == 1 and cadence.wake.is_set()
+    cadence.observe(confident)
+    cadence.observe(confident)
+    assert cadence.stride == 2
+    cadence.on_event({"event": "eye_closure"})
+    assert cadence.stride == 1 and all(cadence.should_score() for _ in range(3))
+
+    # A relative drop tightens even while the margin is still above confident_margin
+    for _ in range(4):
+        cadence.observe(confident)
+    assert cadence.stride == 4
+    cadence.observe({"prediction": "Alert", "margin": 40.0})  # small wobble: keeps the stride
+    assert cadence.stride == 4
+    cadence.observe({"prediction": "Alert", "margin": 20.0})
+    assert cadence.stride == 1 and cadence.broadcast_interval == 1
+
+    report = cadence.report()
+    assert report["frames_skipped"] == 6 and report["cpu_saved_s"] > 0
+    print("Adaptive cadence test passed.")
+
+# ------------------------
+# Test signal-quality gate
+# ------------------------
+def test_signal_quality():
+    print("Testing signal-quality gate...")
+    rng = np.random.default_rng(0)
+    clean = np.column_stack([
+        0.98 + rng.normal(0, 0.01, FRAME_SIZE), rng.normal(0, 0.02, FRAME_SIZE), 0.2 + rng.normal(0, 0.01, FRAME_SIZE),
+        rng.normal(0, 0.5, (FRAME_SIZE, 3)), np.round(950 + rng.normal(0, 5, FRAME_SIZE)),
+    ])
+    saturated, frozen, dropped, tumbling = clean.copy(), clean.copy(), clean.copy(), clean.copy()
+    saturated[::2, 6] = 4095                 # clipped every other sample, so not flat
+    frozen[100:, :6] = frozen[100, :6]       # IMU stops updating, IR keeps moving
+    dropped[::3, 1] = np.nan
+    tumbling[:, :3] *= 3
+
+    # One call covers a whole batch of windows
+    metrics = quality_metrics(np.stack([clean, saturated, frozen, dropped, tumbling]))
+    failed = failed_checks(metrics)
+    names = list(LIMITS)
+    assert not failed[0].any()
+
+    # check_frame reads frames by column name, whatever their order or extra columns
+    shuffled = pd.DataFrame(clean, columns=SENSOR_CHANNELS)[list(SENSOR_CHANNELS[::-1])]
+    shuffled = shuffled.rename(columns={"ir": "photodiode_value"}).assign(label="drive")
+    frame_metrics, frame_faults = check_frame(shuffled)
+    assert not frame_faults
+    assert frame_metrics == pytest.approx({name: float(value[0]) for name, value in metrics.items()})
+    for window, check in enumerate(["saturation", "flatline", "dropout", "imu_outliers"], start=1):
+        assert failed[window].tolist() == [name == check for name in names], (check, failed[window])
+
+    # Failing frames skip feature extraction and scoring
+    extractor = FeatureExtractor(sample_rate=SAMPLE_RATE, blink_threshold=BLINK_THRESHOLD, nod_threshold=NOD_THRESHOLD)
+    alert_model, drowsy_model = load_models()
+    columns = [c if c != "ir" else "photodiode_value" for c in SENSOR_CHANNELS]
+    result = analyze_frame(pd.DataFrame(saturated, columns=columns), extractor, alert_model, drowsy_model)
+    assert result["status"] == "Sensor fault" and result["faults"] == ["saturation"]
+    assert result["metrics"] is None and result["prediction"] is None
+    result = analyze_frame(pd.DataFrame(clean, columns=columns), extractor, alert_model, drowsy_model)
+    assert result["faults"] == [] and result["prediction"] in ("Alert", "Drowsy")
+    print("Signal-quality gate test passed.")
+
+# ------------------------
+# Test typed channel schema
+# ------------------------
+@pytest.mark.asyncio
+async def test_channel_schema(tmp_path):
+    print("Testing typed channel schema...")
+    assert FRAME_DTYPE.itemsize == 6 * 4 + 2, "Six float32 IMU channels and an int16 IR channel per sample"
+
+    # IR is rounded into int16; a missing IR reading becomes IR_MISSING, never a closed eye
+    records = to_records([[0.982, 0.012, 0.215, 0.9, -0.01, 0.3, 120.4], [0.98, 0.01, 0.2, 0, 0, 0, np.nan]])
+    assert records["photodiode_value"].tolist() == [120, IR_MISSING]
+    assert records["ax"][0] == np.float32(0.982)
+
+    # Frames, the buffer and the recording all carry the schema dtypes
+    queue = asyncio.Queue()
+    processor = DataProcessor(queue, raw_csv_path=str(tmp_path / "raw.csv"))
+    processor.process_data("\n".join(["0.982,0.012,0.215,0.9,-0.01,0.3,950"] * (FRAME_SIZE + 5)))
+    frame = await queue.get()
+    assert processor.buffer.dtype == FRAME_DTYPE and len(processor.buffer) == 5
+    assert frame["photodiode_value"].dtype == np.int16 and frame["gz"].dtype == np.float32
+    assert frame.memory_usage(index=False).sum() == FRAME_SIZE * FRAME_DTYPE.itemsize
+    recording = load_recording(str(tmp_path / "raw.csv"))
+    assert len(recording) == FRAME_SIZE + 5 and recording["ir"].dtype == np.int16
+    assert recording["ax"].iloc[0] == np.float32(0.982)
+
+    # Missing IR readings count as dropouts in the quality gate
+    missing_ir = frame.copy()
+    missing_ir.loc[:FRAME_SIZE // 2, "photodiode_value"] = IR_MISSING
+    assert "dropout" in check_frame(missing_ir)[1]
+    print("Typed channel schema test passed.")
+
+# ------------------------
+# Test soak monitoring and budget gates
+# ------------------------
+def test_soak_monitoring():
+    print("Testing soak monitoring...")
+    stats = StageStats(window=100, gauge_points=64)
+    for ms in range(1, 201):
+        stats.record("analyze", ms / 1000)
+    # Only the last `window` durations count: 101..200 ms
+    pct = stats.percentiles("analyze")
+    assert pct["p50"] == pytest.approx(150.5) and pct["p99"] == pytest.approx(199.01)
+    assert stats.percentiles("missing") == {"p50": 0.0, "p99": 0.0}
+
+    # Gauges stay bounded over a long run but still span it, with exact min/max/last
+    for t in range(10000):
+        stats.gauge("rss_bytes", 1e6 + t * 1000, timestamp=float(t))
+    series = stats.gauges["rss_bytes"]
+    assert len(series) <= 64 and series.points[0, 0] == 0 and series.points[-1, 0] > 9000
+    assert series.min == 1e6 and series.max == series.last == 1e6 + 9999 * 1000
+
+    # 1000 units per second is 3.6e6 per hour; points before `since` are ignored
+    assert slope_per_hour(series, since=0) == pytest.approx(3.6e6)
+    assert slope_per_hour([(0, 5.0), (3600, 5.0), (7200, 5.0)], since=0) == pytest.approx(0.0)
+    assert slope_per_hour([(0, 0.0), (1, 1.0)], since=0) == 0.0, "Too few points for a fit"
+
+    args = parse_args(["--rate", "100", "--max-rss-slope-mb", "5", "--max-clients", "2"])
+    report = {"achieved_rate_hz": 99.0, "stages_ms": {"analyze": {"p99": 10.0}, "loop_lag": {"p99": 1.0}},
+              "slopes_per_hour": {"rss_bytes": 1e6, "tasks": 0.0}}
+    stats.gauge("ws_clients", 1)
+    assert check_budgets(report, stats, args) == []
+    report["slopes_per_hour"]["rss_bytes"] = 6e6
+    report["achieved_rate_hz"] = 50.0
+    report["stages_ms"]["loop_lag"]["p99"] = 500.0
+    stats.gauge("ws_clients", 3)
+    failures = check_budgets(report, stats, args)
+    assert len(failures) == 4
+    assert any(f.startswith("RSS grows") for f in failures) and any(f.startswith("loop_lag") for f in failures)
+    print("Soak monitoring test passed.")
+
 # ------------------------
 # Run all tests
 # ------------------------
@@ -151,6 +724,18 @@ async def main():
     test_feature_extractor()
     test_baseline_hmm()
     await test_integration()
+    test_shared_ring_buffer()
+    test_device_ingest(Path(tempfile.mkdtemp()))
+    test_state_history(Path(tempfile.mkdtemp()))
+    test_microsleep_detector()
+    test_threshold_sweep(Path(tempfile.mkdtemp()))
+    await test_checkpoint_restore(Path(tempfile.mkdtemp()))
+    test_device_state(Path(tempfile.mkdtemp()))
+    test_text_parser()
+    test_adaptive_cadence()
+    test_signal_quality()
+    await test_channel_schema(Path(tempfile.mkdtemp()))
+    test_soak_monitoring()
     print("All tests passed!")
 
 if __name__ == "__main__":